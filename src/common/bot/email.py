@@ -1,75 +1,480 @@
+import asyncio
+import logging
+import select
 import smtplib as smtp
+import socket
+import ssl
 import imaplib as imap
 import email as eml
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from collections import deque
+from collections.abc import Iterable
+from functools import partial
+from time import time
+from re import compile, escape, IGNORECASE, Pattern
+from typing import Callable, Optional, TypeVar
+
+from discord.ext import tasks
 
 from common.bot.emailstatus import EmailStatus, timeout, undelivered, valid_reply, no_response
+from common.data import userdb
 from common.data.user import UserEntry
-from common.data.settings import google_cfg, discord_cfg as dcfg
+from common.data.settings import _GoogleSettings, google_cfg, discord_cfg as dcfg
+
+log = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+_postmaster: str = 'postmaster@pennstateoffice365.onmicrosoft.com'
+_fetch_uid: Pattern = compile(rb'\bUID (\d+)')
+# Line breaks of a folded header, e.g. the long subject of a bounce, which compat32 parsing leaves in place.
+_folds: Pattern = compile(r'\r?\n(?=[ \t])')
+_outbox_base_backoff: float = 10
+# SMTP errors caused by the message itself rather than the connection. Messages failing with these are not retried
+# by the sender.
+_message_errors: tuple[type[smtp.SMTPException], ...] = (smtp.SMTPRecipientsRefused, smtp.SMTPSenderRefused, smtp.SMTPDataError)
+
+
+def _is_temporary(error: smtp.SMTPException) -> bool:
+    """
+    :return: True if the server rejected the message with a 4xx reply, such as Gmail's 421 and 451 rate limiting,
+    which is worth retrying.
+    """
+    if isinstance(error, smtp.SMTPRecipientsRefused):
+        return all(code < 500 for code, _ in error.recipients.values())
+    return getattr(error, 'smtp_code', 500) < 500
+
+
+def _unfold(header: str) -> str:
+    return _folds.sub('', header)
+
+
+def _has_input(conn: imap.IMAP4) -> bool:
+    """
+    :return: True if input from the server is waiting on `conn`. Unlike select on its socket, this also sees lines
+    imaplib has already read ahead into its buffer, and data the TLS layer has already decrypted.
+    """
+    timeout = conn.sock.gettimeout()
+    conn.sock.settimeout(0)
+    try:
+        return bool(conn.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        conn.sock.settimeout(timeout)
 
 
 class Gmail:
     content: str = 'Please respond to this email to verify your discord identity.\n\n' \
                    '(This is an automated email. Please ignore this email if you did not request verification)'
     email_subject: str = 'PSU Software Discord Verification Email'
+    reply_subject: Pattern = compile(escape(email_subject) + r' - (\S+@psu\.edu)', IGNORECASE)
 
-    def __init__(self):
-        self.__smtp_conn: smtp.SMTP = self.__new_smtp_conn
-        self.__imap: imap.IMAP4_SSL = self.__new_imap_conn
+    def __init__(self, config: _GoogleSettings = google_cfg):
+        """
+        Asynchronous Gmail client. smtplib and imaplib block, so every SMTP call runs on a dedicated SMTP worker
+        thread and every IMAP call on a dedicated IMAP worker thread. Each connection is only ever touched by its own
+        thread, and the event loop never waits on Gmail. Connections are opened on first use.
 
-    @property
-    def __new_smtp_conn(self):
-        conn = smtp.SMTP('smtp.gmail.com', 587)
-        conn.ehlo()
-        conn.starttls()
+        Outgoing emails are queued and sent back-to-back over a single reused SMTP session by a background sender,
+        which respects the `send_rate` per minute cap from the google config and reconnects with exponential backoff.
+        After a temporary rejection, the sender backs off the same way before sending the next email.
+
+        :param config: The google settings to connect with. Defaults to the google section of config.json.
+        """
+        self.__cfg: _GoogleSettings = config
+        self.__smtp_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gmail-smtp')
+        self.__imap_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gmail-imap')
+        self.__idle_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gmail-idle')
+        self.__smtp_conn: Optional[smtp.SMTP] = None
+        self.__imap_conn: Optional[imap.IMAP4] = None
+        self.__idle_conn: Optional[imap.IMAP4] = None
+        self.__outgoing: asyncio.Queue[tuple[str, asyncio.Future]] = asyncio.Queue()
+        self.__sent_times: deque[float] = deque()
+        self.__sender: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def __run(executor: ThreadPoolExecutor, fn: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args))
+
+    def __new_smtp_conn(self) -> smtp.SMTP:
+        conn = smtp.SMTP(self.__cfg.smtp_host, self.__cfg.smtp_port)
+        if self.__cfg.use_tls:
+            conn.ehlo()
+            conn.starttls()
         conn.ehlo()
-        conn.login(google_cfg.email, google_cfg.password)
+        conn.login(self.__cfg.email, self.__cfg.password)
         return conn
 
-    @property
-    def __new_imap_conn(self):
-        conn = imap.IMAP4_SSL('imap.gmail.com')
-        conn.login(google_cfg.email, google_cfg.password)
-        conn.select('"[Gmail]/All Mail"')
+    def __new_imap_conn(self) -> imap.IMAP4:
+        conn_type = imap.IMAP4_SSL if self.__cfg.use_tls else imap.IMAP4
+        conn = conn_type(self.__cfg.imap_host, self.__cfg.imap_port)
+        conn.login(self.__cfg.email, self.__cfg.password)
+        conn.select(self.__cfg.mailbox)
         return conn
 
     @property
-    def __smtp(self) -> smtp.SMTP:
+    def __imap(self) -> imap.IMAP4:
         """
-        Proxy for __smtp_conn. This property should be used over __smtp_conn since this property handles disconnect
-        logic.
+        Proxy for __imap_conn which opens the connection on first use. Must only be used from the IMAP worker thread.
+        """
+        if self.__imap_conn is None:
+            self.__imap_conn = self.__new_imap_conn()
+        return self.__imap_conn
+
+    def __idle(self, timeout: float) -> bool:
+        """
+        Blocks in IMAP IDLE on a connection of its own until the server reports new mail or `timeout` seconds pass.
+        The connection is dropped if anything goes wrong, and reopened by the next call. Must only be used from the
+        IDLE worker thread.
         """
         try:
-            status, _ = self.__smtp_conn.noop()
-        except smtp.SMTPServerDisconnected:
-            self.__smtp_conn.quit()
-            self.__smtp_conn = self.__new_smtp_conn
-        return self.__smtp_conn
+            if self.__idle_conn is None:
+                self.__idle_conn = self.__new_imap_conn()
+                if 'IDLE' not in self.__idle_conn.capabilities:
+                    raise imap.IMAP4.error('IMAP server does not support IDLE')
+            conn = self.__idle_conn
+            tag = conn._new_tag()
+            conn.send(tag + b' IDLE\r\n')
+            if not conn.readline().startswith(b'+'):
+                raise imap.IMAP4.abort('IDLE was rejected')
+            if not _has_input(conn):
+                select.select([conn.sock], [], [], timeout)
+            conn.send(b'DONE\r\n')
+            arrived = False
+            while not (line := conn.readline()).startswith(tag):
+                if not line:
+                    raise imap.IMAP4.abort('IMAP connection closed during IDLE')
+                arrived = arrived or b'EXISTS' in line
+            return arrived
+        except (imap.IMAP4.error, OSError):
+            self.__close_idle()
+            raise
 
-    def send_email_to(self, email: str):
+    def __send_email_to(self, email: str):
+        """
+        Sends a verification email over the reused SMTP session, opening the session if there is none. The session is
+        dropped, without a QUIT to a possibly dead server, if sending fails for any reason other than the message
+        itself. Must only be used from the SMTP worker thread.
+        """
         message = MIMEMultipart()
-        message['From'] = google_cfg.email
+        message['From'] = self.__cfg.email
         message['To'] = email
         message['Subject'] = Gmail.email_subject + f' - {email}'
         message.attach(MIMEText(Gmail.content, 'plain'))
-        self.__smtp.send_message(message)
+        if self.__smtp_conn is None:
+            self.__smtp_conn = self.__new_smtp_conn()
+        try:
+            self.__smtp_conn.send_message(message)
+        except _message_errors:
+            raise
+        except OSError:
+            self.__smtp_conn.close()
+            self.__smtp_conn = None
+            raise
+
+    def __check_for_replies(self, users: list[UserEntry]) -> dict[int, EmailStatus]:
+        """
+        Checks for replies on the reused IMAP connection. The connection is dropped if it fails, and reopened by the
+        next check. Must only be used from the IMAP worker thread.
+        """
+        try:
+            return self.__read_replies(users)
+        except (imap.IMAP4.abort, OSError):
+            self.__drop_imap()
+            raise
 
-    def check_for_replies(self, user: UserEntry) -> EmailStatus:
+    def __read_replies(self, users: list[UserEntry]) -> dict[int, EmailStatus]:
+        pending = {user.psu_email.lower(): user for user in users}
+        replies: dict[int, EmailStatus] = {}
         self.__imap.noop()
-        _, responses = self.__imap.uid('SEARCH', f'(SUBJECT "{Gmail.email_subject} - {user.psu_email}" UNSEEN)')
-        responses = responses[0].split()
-        if len(responses) == 0:
-            if (datetime.now() - user.joined).days > dcfg.email_response_timeout:
-                return timeout
-            return no_response
-        _, msg_data = self.__imap.uid('FETCH', responses[0], '(BODY[HEADER])')
-        msg = eml.message_from_bytes(msg_data[0][1])
-        if msg['From'] in 'postmaster@pennstateoffice365.onmicrosoft.com':
-            return undelivered
-        return valid_reply
+        _, responses = self.__imap.uid('SEARCH', f'(SUBJECT "{Gmail.email_subject}" UNSEEN)')
+        uids = responses[0].split()
+        if uids and pending:
+            # Headers are peeked, so replies from users that are not pending yet stay unseen for a later check.
+            _, msg_data = self.__imap.uid('FETCH', b','.join(uids), '(BODY.PEEK[HEADER.FIELDS (SUBJECT FROM)])')
+            matched: list[bytes] = []
+            for part in msg_data:
+                if not isinstance(part, tuple) or (uid := _fetch_uid.search(part[0])) is None:
+                    continue
+                msg = eml.message_from_bytes(part[1])
+                subject_email = Gmail.reply_subject.search(_unfold(msg['Subject'] or ''))
+                if subject_email is None or (user := pending.get(subject_email.group(1).lower())) is None:
+                    continue
+                matched.append(uid.group(1))
+                if _postmaster in (msg['From'] or ''):
+                    replies.setdefault(user.user_id, undelivered)
+                else:
+                    replies[user.user_id] = valid_reply
+            if matched:
+                self.__imap.uid('STORE', b','.join(matched), '+FLAGS', '(\\Seen)')
+        for user in users:
+            if user.user_id not in replies:
+                overdue = (datetime.now() - user.joined).days > dcfg.email_response_timeout
+                replies[user.user_id] = timeout if overdue else no_response
+        return replies
+
+    def send_email_to(self, email: str) -> asyncio.Future:
+        """
+        Queues a verification email to be sent by the background sender, starting the sender if it is not running.
+
+        :param email: The address to send the verification email to.
+        :return: A future resolved once the email is sent. It holds an exception if the email was rejected, even if
+        only temporarily.
+        """
+        sent = asyncio.get_event_loop().create_future()
+        self.__outgoing.put_nowait((email, sent))
+        if self.__sender is None or self.__sender.done():
+            self.__sender = asyncio.get_event_loop().create_task(self.__send_queued())
+        return sent
+
+    async def __wait_for_send_slot(self):
+        """
+        Waits until sending another email stays within `send_rate` emails per minute.
+        """
+        loop = asyncio.get_running_loop()
+        while self.__sent_times and loop.time() - self.__sent_times[0] >= 60:
+            self.__sent_times.popleft()
+        if len(self.__sent_times) >= self.__cfg.send_rate:
+            await asyncio.sleep(60 - (loop.time() - self.__sent_times.popleft()))
+        self.__sent_times.append(loop.time())
+
+    async def __send_queued(self):
+        backoff = 1.0
+        while True:
+            email, sent = await self.__outgoing.get()
+            await self.__wait_for_send_slot()
+            while True:
+                try:
+                    await self.__run(self.__smtp_executor, self.__send_email_to, email)
+                except _message_errors as e:
+                    log.warning('Could not send verification email to %s: %s', email, e)
+                    if not sent.done():
+                        sent.set_exception(e)
+                    if _is_temporary(e):
+                        # The email is failed rather than retried, so one recipient that keeps being rejected does not
+                        # hold up the queue, but the next email waits in case the server is throttling.
+                        await asyncio.sleep(backoff)
+                        backoff = min(backoff * 2, self.__cfg.send_max_backoff)
+                except OSError as e:
+                    log.warning('SMTP connection failed, retrying in %.0fs: %s', backoff, e)
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.__cfg.send_max_backoff)
+                    continue
+                except Exception as e:
+                    log.exception('Could not send verification email to %s', email)
+                    if not sent.done():
+                        sent.set_exception(e)
+                else:
+                    backoff = 1.0
+                    if not sent.done():
+                        sent.set_result(None)
+                break
+
+    async def check_for_replies(self, users: Iterable[UserEntry]) -> dict[int, EmailStatus]:
+        """
+        Checks for replies from every pending user with a single IMAP search. Unseen verification emails are mapped
+        back to their users by the email address in their subject. Only the emails matched to one of `users` are marked
+        as seen, the rest stay unseen for a later check.
+
+        :param users: The users waiting on an email reply.
+        :return: Maps the id of every user in `users` to the EmailStatus handler for their reply.
+        """
+        return await self.__run(self.__imap_executor, self.__check_for_replies, list(users))
+
+    async def wait_for_mail(self, timeout: float) -> bool:
+        """
+        Waits in IMAP IDLE for new mail to arrive in the mailbox.
+
+        :param timeout: The longest time in seconds to wait for.
+        :return: True if the server reported activity before `timeout`, otherwise False.
+        :raises imaplib.IMAP4.error: Raised if the server does not support IDLE or the connection fails.
+        :raises OSError: Raised if the connection fails.
+        """
+        return await self.__run(self.__idle_executor, self.__idle, timeout)
+
+    def __close_smtp(self):
+        if self.__smtp_conn is not None:
+            try:
+                self.__smtp_conn.quit()
+            except smtp.SMTPServerDisconnected:
+                self.__smtp_conn.close()
+            self.__smtp_conn = None
+
+    def __close_imap(self):
+        if self.__imap_conn is not None:
+            self.__imap_conn.logout()
+            self.__imap_conn = None
+
+    def __drop_imap(self):
+        if self.__imap_conn is not None:
+            try:
+                self.__imap_conn.shutdown()
+            except OSError:
+                pass
+            self.__imap_conn = None
+
+    def __close_idle(self):
+        if self.__idle_conn is not None:
+            try:
+                self.__idle_conn.shutdown()
+            except OSError:
+                pass
+            self.__idle_conn = None
 
     def unload(self):
-        self.__smtp_conn.quit()
-        self.__imap.logout()
+        """
+        Closes every connection on its worker thread without waiting for them to finish. A pending IDLE is woken by
+        shutting down its socket. Emails still queued are not sent.
+        """
+        if self.__sender is not None:
+            self.__sender.cancel()
+            self.__sender = None
+        while not self.__outgoing.empty():
+            _, sent = self.__outgoing.get_nowait()
+            sent.cancel()
+        if (idle_conn := self.__idle_conn) is not None:
+            try:
+                idle_conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.__smtp_executor.submit(self.__close_smtp)
+        self.__imap_executor.submit(self.__close_imap)
+        self.__idle_executor.submit(self.__close_idle)
+        self.__smtp_executor.shutdown(wait=False)
+        self.__imap_executor.shutdown(wait=False)
+        self.__idle_executor.shutdown(wait=False)
+
+
+class ReplyWatcher:
+    def __init__(self, gmail: Gmail, poller: tasks.Loop):
+        """
+        Drives email reply checks. In poll mode, `poller` simply runs every `email_refresh_rate` seconds. In push mode
+        (`push_mode` in the google config), replies are checked as soon as IMAP IDLE reports new mail, and at least
+        every `idle_timeout` seconds. If IDLE fails, the watcher falls back to running `poller` and retries IDLE with
+        exponential backoff. If a reply check fails, it falls back to running `poller` as well. `poller` is stopped
+        once IDLE and a reply check succeed again.
+
+        :param gmail: The Gmail client to wait for mail with.
+        :param poller: The task loop that checks for email replies.
+        """
+        self.__gmail: Gmail = gmail
+        self.__poller: tasks.Loop = poller
+        self.__watcher: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not google_cfg.push_mode:
+            self.__poller.start()
+        elif self.__watcher is None:
+            self.__watcher = asyncio.get_event_loop().create_task(self.__watch())
+
+    async def __watch(self):
+        backoff = 1.0
+        while True:
+            try:
+                await self.__gmail.wait_for_mail(google_cfg.idle_timeout)
+            except (imap.IMAP4.error, OSError) as e:
+                log.warning('IMAP IDLE failed, polling for replies until it reconnects in %.0fs: %s', backoff, e)
+                if not self.__poller.is_running():
+                    self.__poller.start()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, google_cfg.idle_max_backoff)
+                continue
+            backoff = 1.0
+            try:
+                await self.__poller()
+            except Exception:
+                log.exception('Checking for email replies failed, polling for replies until a check succeeds')
+                if not self.__poller.is_running():
+                    self.__poller.start()
+                continue
+            if self.__poller.is_running():
+                log.info('IMAP IDLE and reply checks are working again, stopped polling for replies')
+                self.__poller.stop()
+
+    def stop(self):
+        if self.__watcher is not None:
+            self.__watcher.cancel()
+            self.__watcher = None
+        self.__poller.cancel()
+
+
+class OutboxSender:
+    def __init__(self, gmail: Gmail):
+        """
+        Drains the verification email outbox through `gmail`. An email stays in the outbox until it is sent, so
+        emails queued before a crash or during a Gmail outage are sent once the bot is back up. Connection failures are
+        retried by `gmail` itself, so an email that still fails to send was rejected. It is retried with exponential
+        backoff, up to `outbox_max_backoff` seconds apart, and dropped after `outbox_max_attempts` attempts.
+
+        :param gmail: The Gmail client to send emails with.
+        """
+        self.__gmail: Gmail = gmail
+        self.__in_flight: dict[int, asyncio.Task] = {}
+        self.__worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.__worker is None:
+            self.__worker = asyncio.get_event_loop().create_task(self.__drain())
+
+    async def __drain(self):
+        backoff = _outbox_base_backoff
+        while True:
+            try:
+                # Finished deliveries are only forgotten before querying, so the query sees their outcome committed
+                # and never returns an email that is being or has just been delivered.
+                self.__in_flight = {email_id: task for email_id, task in self.__in_flight.items() if not task.done()}
+                for email_id, email, attempts in await userdb.due_emails():
+                    if email_id not in self.__in_flight:
+                        self.__in_flight[email_id] = asyncio.create_task(self.__deliver(email_id, email, attempts))
+                await self.__wait_for_due()
+            except Exception:
+                # The worker is never restarted, so a failed query (e.g. a busy database) must not end it.
+                log.exception('Failed to read the outbox, retrying in %.0fs', backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, google_cfg.outbox_max_backoff)
+            else:
+                backoff = _outbox_base_backoff
+
+    async def __wait_for_due(self):
+        """
+        Waits until the next outbox email is due, a new email is queued, or `outbox_interval` seconds pass.
+        """
+        wait = google_cfg.outbox_interval
+        if (due := await userdb.next_email_due()) is not None:
+            wait = min(wait, due - time())
+        try:
+            await asyncio.wait_for(userdb.outbox_ready.wait(), timeout=wait)
+        except asyncio.TimeoutError:
+            pass
+        userdb.outbox_ready.clear()
+
+    async def __deliver(self, email_id: int, email: str, attempts: int):
+        try:
+            await self.__gmail.send_email_to(email)
+        except Exception as e:
+            attempts += 1
+            if attempts >= google_cfg.outbox_max_attempts:
+                log.error('Giving up on verification email to %s after %d attempts: %s', email, attempts, e)
+                await userdb.complete_email(email_id)
+                return
+            delay = min(_outbox_base_backoff * 2 ** (attempts - 1), google_cfg.outbox_max_backoff)
+            log.warning('Verification email to %s failed %d time(s), retrying in %.0fs: %s', email, attempts, delay, e)
+            await userdb.retry_email(email_id, attempts, delay)
+            userdb.outbox_ready.set()
+        else:
+            await userdb.complete_email(email_id)
+
+    def stop(self):
+        """
+        Stops draining the outbox and cancels every delivery in progress. Cancelled emails stay in the outbox.
+        """
+        if self.__worker is not None:
+            self.__worker.cancel()
+            self.__worker = None
+        for delivery in self.__in_flight.values():
+            delivery.cancel()
+        self.__in_flight.clear()
@@ -1,9 +1,9 @@
-from collections import Callable, Awaitable
+from collections.abc import Callable, Awaitable
 
 from common.bot import userstatus
 from common.bot.views.statusview import UserStatusView
 from common.data import embeds as emb
-from common.data._userdb import UserEntryManager
+from common.data.userdb import UserEntryManager
 from common.data.user import UserEntry
 
 
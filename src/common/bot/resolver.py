@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Final, Optional, Union
+
+from discord import ClientException, Guild, Member, User
+from discord.ext import commands
+
+from common.data.settings import discord_cfg
+
+log = logging.getLogger(__name__)
+
+_QUERY_LIMIT: Final = 100     # discord accepts at most 100 user ids per member query.
+
+DiscordUser = Union[User, Member]
+
+
+class DiscordResolver:
+    def __init__(self, ttl: float, max_size: int):
+        """
+        Resolves user ids to discord Users and Members with as few REST calls as possible.
+
+        Lookups try the gateway cache of the client first, then a bounded TTL cache of objects this resolver has
+        fetched, and only then fall back to a REST fetch. Concurrent fetches of the same id share one request.
+        Members can be fetched in bulk ahead of time with `prefetch_members`.
+
+        :param ttl: The number of seconds a fetched User or Member is kept before it is fetched again.
+        :param max_size: The maximum number of cached Users and Members. The least recently used is evicted first.
+        """
+        self.__ttl: float = ttl
+        self.__max_size: int = max_size
+        self.__entries: OrderedDict[int, tuple[float, DiscordUser]] = OrderedDict()
+        self.__in_flight: dict[tuple[type, int], asyncio.Future] = {}
+        self.hits: int = 0
+        self.fetches: int = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __cached(self, user_id: int, kind: Union[type, tuple[type, ...]]) -> Optional[DiscordUser]:
+        entry = self.__entries.get(user_id)
+        if entry is None:
+            return None
+        expires, user = entry
+        if expires < time.monotonic():
+            del self.__entries[user_id]
+            return None
+        if not isinstance(user, kind):
+            return None
+        self.__entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def put(self, user: DiscordUser) -> None:
+        """
+        Caches `user`. A cached Member is never replaced by a plain User, since a Member resolves both lookups.
+        """
+        entry = self.__entries.get(user.id)
+        if isinstance(user, User) and entry is not None and isinstance(entry[1], Member):
+            return
+        self.__entries[user.id] = (time.monotonic() + self.__ttl, user)
+        self.__entries.move_to_end(user.id)
+        if len(self.__entries) > self.__max_size:
+            self.__entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        self.__entries.pop(user_id, None)
+
+    async def __fetch(self, kind: type, user_id: int, fetch: Callable[[int], Awaitable[DiscordUser]]) -> DiscordUser:
+        """
+        Fetches `user_id` with `fetch`, or waits for a fetch of the same kind that is already in flight.
+        """
+        key = (kind, user_id)
+        if (in_flight := self.__in_flight.get(key)) is not None:
+            return await asyncio.shield(in_flight)
+        in_flight = asyncio.get_running_loop().create_future()
+        self.__in_flight[key] = in_flight
+        try:
+            self.fetches += 1
+            user = await fetch(user_id)
+        except asyncio.CancelledError:
+            in_flight.cancel()
+            raise
+        except Exception as e:
+            in_flight.set_exception(e)
+            in_flight.exception()     # mark retrieved, waiters re-raise it themselves.
+            raise
+        finally:
+            del self.__in_flight[key]
+        self.put(user)
+        in_flight.set_result(user)
+        return user
+
+    async def user(self, bot: commands.Bot, user_id: int) -> DiscordUser:
+        """
+        :return: The discord User with id `user_id`. May be a Member of the operating discord if one is cached.
+        """
+        return bot.get_user(user_id) or self.__cached(user_id, (User, Member)) or \
+            await self.__fetch(User, user_id, bot.fetch_user)
+
+    async def member(self, guild: Guild, user_id: int) -> Member:
+        """
+        :return: The Member of `guild` with id `user_id`.
+        """
+        member = guild.get_member(user_id) or self.__cached(user_id, Member)
+        if member is not None and member.guild.id == guild.id:
+            return member
+        return await self.__fetch(Member, user_id, guild.fetch_member)
+
+    async def prefetch_members(self, guild: Guild, user_ids: Iterable[int]) -> int:
+        """
+        Fetches the Members of `guild` with ids in `user_ids` over the gateway, `_QUERY_LIMIT` ids per request, and
+        caches them. Members already in the client's cache are skipped. Does nothing if the members intent is disabled,
+        since the gateway refuses member queries by id without it.
+
+        :return: The number of Members fetched.
+        """
+        missing = [user_id for user_id in dict.fromkeys(user_ids) if guild.get_member(user_id) is None]
+        fetched = 0
+        for start in range(0, len(missing), _QUERY_LIMIT):
+            try:
+                members = await guild.query_members(user_ids=missing[start:start + _QUERY_LIMIT], limit=_QUERY_LIMIT)
+            except ClientException:
+                log.info('Members intent disabled, members will be fetched as they are needed')
+                return fetched
+            for member in members:
+                self.put(member)
+            fetched += len(members)
+        log.info('Prefetched %d of %d uncached members of %s', fetched, len(missing), guild.name)
+        return fetched
+
+    def __repr__(self) -> str:
+        return f'DiscordResolver(size={len(self)}/{self.__max_size}, ttl={self.__ttl}, hits={self.hits}, ' \
+               f'fetches={self.fetches})'
+
+
+resolver: DiscordResolver = DiscordResolver(discord_cfg.resolver_ttl, discord_cfg.resolver_cache_size)
@@ -1,23 +1,157 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from discord import User
 from discord.ext import commands
 
+from common.bot.views.dispatcher import StatusViewDispatcher
 from common.bot.views.statusview import UserStatusView
+from common.data import userdb
+from common.data.settings import discord_cfg
 from common.data.user import UserEntry
 
 _are_status_views_loaded: bool = False
-_loaded_status_views: dict[int, UserStatusView] = {}
+# Loaded views by user id, least recently used first.
+_loaded_status_views: OrderedDict[int, UserStatusView] = OrderedDict()
+_last_used: dict[int, float] = {}
+_status_message_users: dict[int, int] = {}
+_loading: dict[int, asyncio.Task] = {}
+# Number of callers using each user's view, see `using_status_view`. Views in use are never evicted.
+_in_use: Counter[int] = Counter()
+_dispatcher: Optional[StatusViewDispatcher] = None
+
+
+def __forget(user_id: int) -> Optional[UserStatusView]:
+    view = _loaded_status_views.pop(user_id, None)
+    _last_used.pop(user_id, None)
+    if view is not None:
+        _status_message_users.pop(view.user_entry.status_message_id, None)
+    return view
 
 
 def __on_view_termination(user: User):
-    _loaded_status_views.pop(user.id)
+    __forget(user.id)
+
+
+def __touch(user_id: int):
+    _loaded_status_views.move_to_end(user_id)
+    _last_used[user_id] = time.monotonic()
+
+
+def __evict_idle_views():
+    """
+    Stops and forgets every status view that is not in use and has not been used for `status_view_idle_timeout`
+    seconds. Stopping a view also removes it from the bot's view store, so later interactions with its message reach
+    the dispatcher.
+    """
+    idle_since = time.monotonic() - discord_cfg.status_view_idle_timeout
+    for user_id in list(_loaded_status_views):
+        if _last_used[user_id] > idle_since:
+            return
+        if user_id not in _in_use:
+            __forget(user_id).stop()
 
 
 def make_status_view(bot: commands.Bot, user_entry: UserEntry) -> UserStatusView:
+    """
+    Returns the loaded status view of `user_entry`, loading it first if needed. Unless `status_view_dispatcher` is
+    set, a newly loaded view is registered with `bot` as a persistent view of the user's status message. Otherwise,
+    the view is reached through the dispatcher, and unloaded once it has been idle for `status_view_idle_timeout`
+    seconds, so the view returned must not be held across an await. Use `using_status_view` instead.
+    """
     if user_entry.user_id in _loaded_status_views:
+        __touch(user_entry.user_id)
         return _loaded_status_views[user_entry.user_id]
-    _loaded_status_views[user_entry.user_id] = UserStatusView(user_entry, __on_view_termination)
-    bot.add_view(_loaded_status_views[user_entry.user_id], message_id=user_entry.status_msg_id)
-    return _loaded_status_views[user_entry.user_id]
+    if discord_cfg.status_view_dispatcher:
+        __evict_idle_views()
+    view = UserStatusView(user_entry, __on_view_termination)
+    _loaded_status_views[user_entry.user_id] = view
+    _status_message_users[user_entry.status_message_id] = user_entry.user_id
+    __touch(user_entry.user_id)
+    if not discord_cfg.status_view_dispatcher:
+        bot.add_view(view, message_id=user_entry.status_message_id)
+    return view
+
+
+async def __load_status_view(bot: commands.Bot, message_id: int) -> Optional[UserStatusView]:
+    if (user_details := await userdb.get_entry_by_status_message(message_id)) is None:
+        return None
+    return make_status_view(bot, UserEntry(user_details, bot=bot, is_registered=True))
+
+
+async def load_status_view(bot: commands.Bot, message_id: int) -> Optional[UserStatusView]:
+    """
+    Returns the status view of the status message with id `message_id`, loading the user from the database if their
+    view is not loaded. Concurrent loads of the same message share one database query.
+
+    :return: The status view, or None if the message is not the status message of a registered user.
+    """
+    if (user_id := _status_message_users.get(message_id)) is not None:
+        __touch(user_id)
+        return _loaded_status_views[user_id]
+    if (loading := _loading.get(message_id)) is None:
+        loading = _loading[message_id] = asyncio.create_task(__load_status_view(bot, message_id))
+        loading.add_done_callback(lambda _: _loading.pop(message_id, None))
+    return await asyncio.shield(loading)
+
+
+def __pin(view: UserStatusView) -> int:
+    user_id = view.user_entry.user_id
+    _in_use[user_id] += 1
+    __touch(user_id)
+    return user_id
+
+
+def __unpin(user_id: int):
+    _in_use[user_id] -= 1
+    if _in_use[user_id] <= 0:
+        del _in_use[user_id]
+    if user_id in _loaded_status_views:
+        __touch(user_id)
+
+
+@asynccontextmanager
+async def using_status_view(bot: commands.Bot, user_entry: UserEntry) -> AsyncIterator[UserStatusView]:
+    """
+    Loads the status view of `user_entry` as `make_status_view` does, and keeps it from being evicted until the
+    context exits.
+    """
+    user_id = __pin(make_status_view(bot, user_entry))
+    try:
+        yield _loaded_status_views[user_id]
+    finally:
+        __unpin(user_id)
+
+
+@asynccontextmanager
+async def using_status_message_view(bot: commands.Bot, message_id: int) -> AsyncIterator[Optional[UserStatusView]]:
+    """
+    Loads the status view of the status message with id `message_id` as `load_status_view` does, and keeps it from
+    being evicted until the context exits. Yields None if the message is not the status message of a registered user.
+    """
+    if (view := await load_status_view(bot, message_id)) is None:
+        yield None
+        return
+    user_id = __pin(view)
+    try:
+        yield view
+    finally:
+        __unpin(user_id)
+
+
+def start_dispatcher(bot: commands.Bot) -> None:
+    """
+    Registers the dispatcher that routes status message interactions to lazily loaded status views. Does nothing if
+    the dispatcher is already registered.
+    """
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = StatusViewDispatcher(lambda message_id: using_status_message_view(bot, message_id))
+        bot.add_view(_dispatcher)
 
 
 def get_status_view(user_id: int) -> UserStatusView:
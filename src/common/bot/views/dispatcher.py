@@ -0,0 +1,60 @@
+import logging
+from collections.abc import AsyncIterator, Callable
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from typing import Optional
+
+import discord
+from discord import Interaction
+
+from common.bot.views.statusview import UserStatusView
+
+log = logging.getLogger(__name__)
+
+StatusViewLoader = Callable[[int], AbstractAsyncContextManager[Optional[UserStatusView]]]
+
+# Custom ids of the UserStatusView buttons routed by the dispatcher.
+_status_buttons: tuple[str, ...] = ('185b_verify', '185b_deny', '185b_canvas')
+
+
+class _RoutedButton(discord.ui.Button['StatusViewDispatcher']):
+    async def callback(self, interaction: Interaction):
+        async with self.view.route(interaction) as view:
+            if view is not None:
+                await next(item for item in view.children if item.custom_id == self.custom_id).callback(interaction)
+
+
+class _RoutedSelect(discord.ui.Select['StatusViewDispatcher']):
+    async def callback(self, interaction: Interaction):
+        async with self.view.route(interaction) as view:
+            if view is not None:
+                await view.select_image(self.values[0])
+
+
+class StatusViewDispatcher(discord.ui.View):
+    def __init__(self, load: StatusViewLoader):
+        """
+        A single persistent view that handles the components of every status message.
+
+        The dispatcher is registered without a message id, so discord.py hands it any interaction with a status
+        message component that no view is registered for. Each interaction is routed by message id to the
+        UserStatusView of that status message, which `load` materializes on demand.
+
+        :param load: Returns a context that holds the UserStatusView of the status message with the given id, or None
+        if the message no longer belongs to a registered user. The view must stay loaded until the context exits.
+        """
+        super().__init__(timeout=None)
+        self.__load: StatusViewLoader = load
+        for custom_id in _status_buttons:
+            self.add_item(_RoutedButton(custom_id=custom_id))
+        self.add_item(_RoutedSelect(custom_id='185s_images', options=[discord.SelectOption(label='None')]))
+
+    @asynccontextmanager
+    async def route(self, interaction: Interaction) -> AsyncIterator[Optional[UserStatusView]]:
+        """
+        Holds the UserStatusView of the status message `interaction` came from, or None if there is none.
+        """
+        async with self.__load(interaction.message.id) as view:
+            if view is None:
+                log.warning('Ignoring interaction with message %d, which is not a status message of a registered user',
+                            interaction.message.id)
+            yield view
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from discord.ext import commands
+
+from common.bot import views
+from common.bot.resolver import resolver
+from common.data import userdb
+from common.data.settings import discord_cfg
+from common.data.user import UserEntry
+from common.data.userdetails import UserDetails
+
+log = logging.getLogger(__name__)
+
+
+class StatusViewRehydration:
+    def __init__(self, bot: commands.Bot, concurrency: int = None):
+        """
+        Re-establishes the status views of every unverified user on startup.
+
+        Users are loaded with a single query, their members are prefetched in bulk, and every status view is
+        registered. The users behind the views are then resolved with at most `concurrency` lookups in flight, so the
+        first edit of each status message does not wait on the discord API.
+
+        Progress is kept between runs. If a run fails, or is cancelled by a disconnect, the next run picks up with the
+        users that are not done yet, and a run started while another is in progress waits for it instead.
+
+        :param bot: The bot the status views are registered with.
+        :param concurrency: The maximum number of users resolved at once. Defaults to `rehydration_concurrency` from
+        the discord config.
+        """
+        self.__bot: commands.Bot = bot
+        self.__concurrency: int = concurrency or discord_cfg.rehydration_concurrency
+        self.__pending: Optional[list[UserDetails]] = None
+        self.__registered: set[int] = set()
+        self.__resolved: set[int] = set()
+        self.__task: Optional[asyncio.Task] = None
+        self.__started: Optional[float] = None
+        self.__ready_after: Optional[float] = None
+
+    @property
+    def total(self) -> Optional[int]:
+        """
+        :return: The number of status views to rehydrate, or None if the users have not been loaded yet.
+        """
+        return None if self.__pending is None else len(self.__pending)
+
+    @property
+    def registered(self) -> int:
+        return len(self.__registered)
+
+    @property
+    def resolved(self) -> int:
+        return len(self.__resolved)
+
+    @property
+    def is_ready(self) -> bool:
+        return self.__ready_after is not None
+
+    @property
+    def ready_after(self) -> Optional[float]:
+        """
+        :return: Seconds from the start of the first run until every status view was rehydrated, or None if not ready.
+        """
+        return self.__ready_after
+
+    async def run(self) -> None:
+        """
+        Rehydrates every status view that is not rehydrated yet. Returns immediately once rehydration is complete.
+        """
+        if self.is_ready:
+            return
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__rehydrate())
+        await asyncio.shield(self.__task)
+
+    async def __rehydrate(self) -> None:
+        if self.__started is None:
+            self.__started = time.perf_counter()
+        else:
+            log.info('Resuming status view rehydration at %d registered and %d resolved of %d views', self.registered,
+                     self.resolved, self.total)
+        if self.__pending is None:
+            pending = await userdb.fetch_unverified_users()
+            await resolver.prefetch_members(discord_cfg.operating_discord_, [user.user_id for user in pending])
+            self.__pending = pending
+
+        for user_details in self.__pending:
+            if user_details.user_id not in self.__registered:
+                views.make_status_view(self.__bot, UserEntry(user_details, bot=self.__bot, is_registered=True))
+                self.__registered.add(user_details.user_id)
+
+        limit = asyncio.Semaphore(self.__concurrency)
+        await asyncio.gather(*(
+            self.__resolve(user_details.user_id, limit)
+            for user_details in self.__pending if user_details.user_id not in self.__resolved
+        ))
+
+        self.__ready_after = time.perf_counter() - self.__started
+        log.info('Rehydrated %d status views in %.2fs', self.total, self.__ready_after)
+
+    async def __resolve(self, user_id: int, limit: asyncio.Semaphore) -> None:
+        async with limit:
+            try:
+                await resolver.user(self.__bot, user_id)
+            except Exception as e:
+                # The view is registered either way, the user is resolved again when its status message is edited.
+                log.warning('Could not resolve user %d while rehydrating status views: %r', user_id, e)
+        self.__resolved.add(user_id)
+
+    def __repr__(self) -> str:
+        return f'StatusViewRehydration(total={self.total}, registered={self.registered}, resolved={self.resolved}, ' \
+               f'ready_after={self.__ready_after})'
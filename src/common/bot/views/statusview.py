@@ -1,16 +1,28 @@
+import asyncio
 from collections.abc import Callable
 from typing import Optional
 
 import discord
-from discord import User, SelectOption, Interaction
+from discord import User, SelectOption, Interaction, Embed
 
 from common.bot import userstatus
+from common.bot.userstatus import UserStatus
 from common.exceptions import UserMismatchError
-from common.data.user import UserEntry
+from common.data.user import UserEntry, cache_status_message
 from common.data import embeds as emb
 from common.data.settings import discord_cfg as dcfg
 
 
+def _render_key(embed: Embed, view: discord.ui.View) -> str:
+    """
+    :return: A key that is equal for two status message renders only if they would display the same. The embed's
+    timestamp is left out, since it changes on every render.
+    """
+    embed_data = embed.to_dict()
+    embed_data.pop('timestamp', None)
+    return repr((embed_data, view.to_components()))
+
+
 class ImageSelect(discord.ui.Select['StatusMessage']):
     def __init__(self):
         super().__init__(custom_id='185s_images', placeholder='No Images Available ...', row=1, disabled=True)
@@ -19,13 +31,14 @@ class ImageSelect(discord.ui.Select['StatusMessage']):
         self.selected_image: Optional[str] = None
 
     async def callback(self, interaction: Interaction):
-        selection = self.values[0]
+        await self.view.select_image(self.values[0])
+
+    def select(self, selection: str) -> None:
         for option in self.options:
             if option.value == selection:
                 self.placeholder = option.label
                 break
         self.selected_image = None if selection == 'None' else selection
-        await self.view.update_status_message(display_image=self.selected_image)
 
 
 class UserStatusView(discord.ui.View):
@@ -34,11 +47,37 @@ class UserStatusView(discord.ui.View):
         self.__user_data: UserEntry = user_data
         self.__image_select: ImageSelect = ImageSelect()
         self.__termination_callback: Callable[[User], None] = on_termination
+        self.__pending_edit: Optional[asyncio.Task] = None
+        self.__display_image: Optional[str] = None
+        self.__greeter: Optional[User] = None
+        self.__last_render: Optional[str] = None
         self.add_item(self.__image_select)
+        # A view may be built for a status message that was sent long ago, so its components are restored from
+        # `user_data` rather than left at their defaults, which a later edit would otherwise write back.
+        self.set_selectable_images(user_data.image_urls)
+        if user_data.status in (UserStatus.VERIFIED, UserStatus.DENIED, UserStatus.TERMINATED):
+            self.__disable_controls()
+
+    @property
+    def user_entry(self) -> UserEntry:
+        return self.__user_data
+
+    def is_dispatchable(self) -> bool:
+        # With the dispatcher, interactions must reach this view through the dispatcher, which keeps it loaded while
+        # they are handled. discord.py registers a dispatchable view for every message it is sent or edited with,
+        # which would route later interactions around the dispatcher.
+        return not dcfg.status_view_dispatcher and super().is_dispatchable()
 
     def selected_image(self) -> str:
         return self.__image_select.selected_image
 
+    async def select_image(self, selection: str) -> None:
+        """
+        Displays the image with url `selection` in the status message, or no image if `selection` is 'None'.
+        """
+        self.__image_select.select(selection)
+        await self.update_status_message(display_image=self.__image_select.selected_image)
+
     def set_selectable_images(self, images: list[str]) -> None:
         self.__image_select.options.clear()
         if len(images) == 0:
@@ -66,6 +105,10 @@ class UserStatusView(discord.ui.View):
         - If `display_image` is provided, an image selected from the select dropdown will be embedded into the display message.
         - If `display_image` is None, then there will be no embedded image in the updated status message.
 
+        Updates made within `status_edit_window` seconds of each other are coalesced into a single edit, which uses
+        the `display_image` of the latest update and the latest `greeter` given. Every caller waits for that edit. The
+        edit is skipped if the status message would display exactly as it did after the last applied edit.
+
         :param new_data: Updates user's status message with updated fields from new_data.
         :param display_image: The url of the image to embed in the status message.
         :param greeter: The greeter who interacted with the status message.
@@ -73,15 +116,33 @@ class UserStatusView(discord.ui.View):
         """
         if new_data is not None:
             self.update_user_data(new_data)
-        status_message = await self.__user_data.status_message
+        self.__display_image = display_image
+        if greeter is not None:
+            self.__greeter = greeter
+        if self.__pending_edit is None:
+            self.__pending_edit = asyncio.get_running_loop().create_task(self.__apply_edit())
+        await asyncio.shield(self.__pending_edit)
+
+    async def __apply_edit(self):
+        await asyncio.sleep(dcfg.status_edit_window)
+        self.__pending_edit = None
+        display_image, greeter, self.__greeter = self.__display_image, self.__greeter, None
         updated_embed = await emb.create_status_message(self.__user_data, image_url=display_image, greeter=greeter)
-        await status_message.edit(embed=updated_embed, view=self)
+        render = _render_key(updated_embed, self)
+        if render == self.__last_render:
+            return
+        if (edited := await self.__user_data.status_message.edit(embed=updated_embed, view=self)) is not None:
+            cache_status_message(edited)
+        self.__last_render = render
 
-    async def finalize_verification(self, greeter: User = None) -> None:
+    def __disable_controls(self) -> None:
         self.grant_verification_access.disabled = True
         self.deny_verification_access.disabled = True
         self.request_canvas_image.disabled = True
         self.__image_select.disabled = True
+
+    async def finalize_verification(self, greeter: User = None) -> None:
+        self.__disable_controls()
         await self.update_status_message(greeter=greeter)
         self.__termination_callback(await self.__user_data.user)
         self.stop()
@@ -89,7 +150,7 @@ class UserStatusView(discord.ui.View):
     @discord.ui.button(label='Verify', style=discord.ButtonStyle.green, custom_id='185b_verify', row=0, emoji='\U00002714')
     async def grant_verification_access(self, _: discord.ui.Button, interaction: Interaction):
         self.__user_data.next_status(userstatus.user_verified)
-        user = await dcfg.operating_discord_.fetch_member(self.__user_data.user_id)
+        user = await self.__user_data.member
         dm_channel = await self.__user_data.dm_channel
         await user.remove_roles(dcfg.new_member_role_, reason='User verified')
         await user.add_roles(dcfg.verified_role_, reason='User verified')
@@ -0,0 +1,206 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Optional, Union
+
+import aiosqlite as sqlite
+
+from common.data.migrations import migrate
+from common.data.settings import database_cfg
+from common.exceptions import TransactionAborted
+
+
+class ConnectionPool:
+    def __init__(self, database: str, readers: int = 4, *, commit_interval: float = 0.05, commit_batch: int = 32,
+                 pragmas: dict[str, Union[str, int]] = None):
+        """
+        Process-wide pool of sqlite connections shared by every database context.
+
+        The pool holds a single writer connection and `readers` read-only connections. Writes to sqlite are
+        serialized by the database itself, so the writer is handed out to one borrower at a time while readers are
+        handed out concurrently.
+
+        Writes are group committed: each writer borrower runs inside its own savepoint of a shared transaction, and
+        the transaction is committed once `commit_interval` seconds have passed since the first pending write, or
+        as soon as `commit_batch` writes are pending. A borrower is not released until its writes are committed.
+
+        :param database: Path to the sqlite database file.
+        :param readers: The number of read connections kept open by the pool.
+        :param commit_interval: The longest time in seconds a write waits to be committed.
+        :param commit_batch: The number of pending writes that triggers an immediate commit.
+        :param pragmas: Pragmas applied to every connection as it is opened, e.g. `{'journal_mode': 'wal'}`.
+        """
+        self.__database: str = database
+        self.__reader_count: int = readers
+        self.__writer: Optional[sqlite.Connection] = None
+        self.__write_lock: asyncio.Lock = asyncio.Lock()
+        self.__readers: asyncio.Queue[sqlite.Connection] = asyncio.Queue()
+        self.__connections: list[sqlite.Connection] = []
+        self.__pragmas: dict[str, Union[str, int]] = pragmas or {}
+        self.__commit_interval: float = commit_interval
+        self.__commit_batch: int = commit_batch
+        self.__pending_commits: list[asyncio.Future] = []
+        self.__scheduled_commit: Optional[asyncio.Task] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.__writer is not None
+
+    async def __connect(self) -> sqlite.Connection:
+        conn = await sqlite.connect(self.__database)
+        await conn.execute('PRAGMA foreign_keys = ON')
+        for pragma, value in self.__pragmas.items():
+            await conn.execute(f'PRAGMA {pragma} = {value}')
+        self.__connections.append(conn)
+        return conn
+
+    async def open(self, readers: int = None) -> None:
+        """
+        Opens every connection in the pool and migrates the database to the latest schema version. Must be awaited
+        once before the pool is used.
+
+        :param readers: Overrides the number of read connections given to `__init__`.
+        """
+        if self.is_open:
+            return
+        if readers is not None:
+            self.__reader_count = readers
+        self.__writer = await self.__connect()
+        await migrate(self.__writer)
+        for _ in range(self.__reader_count):
+            self.__readers.put_nowait(await self.__connect())
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[sqlite.Connection]:
+        """
+        Borrows the writer connection. Only one borrower may hold the writer at a time.
+
+        Changes made by the borrower are rolled back if the borrower raises, and are otherwise committed with the
+        next group commit. Exiting the context waits for that commit, and raises if the commit fails. A borrower that
+        changed nothing is released straight away.
+        """
+        async with self.__write_lock:
+            if not self.__writer.in_transaction:
+                await self.__writer.execute('BEGIN')
+            await self.__writer.execute('SAVEPOINT writer')
+            changes = self.__writer.total_changes
+            try:
+                yield self.__writer
+            except BaseException as e:
+                await self.__rollback_savepoint(e)
+                raise
+            if not self.__writer.in_transaction:
+                # The borrower handled an error that made SQLite roll back the entire transaction.
+                aborted = TransactionAborted()
+                self.__fail_pending(aborted)
+                raise aborted
+            await self.__writer.execute('RELEASE writer')
+            if self.__writer.total_changes == changes:
+                if not self.__pending_commits:
+                    # Ends the read transaction this borrower began, which has nothing to write.
+                    await self.__writer.commit()
+                return
+            committed = await self.__queue_commit()
+        await committed
+
+    async def __rollback_savepoint(self, error: BaseException) -> None:
+        """
+        Rolls back the writes of the current writer borrower after it raised `error`. Must be called while holding the
+        write lock.
+
+        Some errors (e.g. SQLITE_FULL, SQLITE_IOERR or SQLITE_BUSY) make SQLite roll back the entire transaction,
+        savepoint included. The writes of every borrower waiting for the group commit are then lost too, so their
+        commits are failed instead of being resolved by a commit that has nothing left to commit.
+        """
+        if self.__writer.in_transaction:
+            try:
+                await self.__writer.execute('ROLLBACK TO writer')
+                await self.__writer.execute('RELEASE writer')
+                return
+            except sqlite.Error:
+                if self.__writer.in_transaction:
+                    await self.__writer.rollback()
+        self.__fail_pending(TransactionAborted(error))
+
+    def __fail_pending(self, error: Exception) -> None:
+        pending, self.__pending_commits = self.__pending_commits, []
+        for committed in pending:
+            if not committed.done():
+                committed.set_exception(error)
+
+    async def __queue_commit(self) -> asyncio.Future:
+        """
+        Queues a commit for the writes of the current writer borrower. Must be called while holding the write lock.
+
+        :return: A future resolved once the writes are committed.
+        """
+        committed = asyncio.get_running_loop().create_future()
+        self.__pending_commits.append(committed)
+        if len(self.__pending_commits) >= self.__commit_batch:
+            await self.__commit()
+        elif self.__scheduled_commit is None:
+            self.__scheduled_commit = asyncio.create_task(self.__commit_later())
+        return committed
+
+    async def __commit_later(self) -> None:
+        await asyncio.sleep(self.__commit_interval)
+        async with self.__write_lock:
+            self.__scheduled_commit = None
+            await self.__commit()
+
+    async def __commit(self) -> None:
+        """
+        Commits the shared write transaction and resolves every pending commit. Must be called while holding the
+        write lock.
+        """
+        if not self.__pending_commits:
+            return
+        try:
+            await self.__writer.commit()
+        except Exception as e:
+            await self.__writer.rollback()
+            self.__fail_pending(e)
+            return
+        pending, self.__pending_commits = self.__pending_commits, []
+        for committed in pending:
+            if not committed.done():
+                committed.set_result(None)
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[sqlite.Connection]:
+        """
+        Borrows a read connection. Waits for a connection to be returned if every reader is in use.
+        """
+        conn = await self.__readers.get()
+        try:
+            yield conn
+        finally:
+            self.__readers.put_nowait(conn)
+
+    async def close(self) -> None:
+        """
+        Commits and closes every connection in the pool.
+        """
+        async with self.__write_lock:
+            if self.__scheduled_commit is not None:
+                self.__scheduled_commit.cancel()
+                self.__scheduled_commit = None
+            await self.__commit()
+            for conn in self.__connections:
+                await conn.commit()
+                await conn.close()
+            self.__connections.clear()
+            self.__readers = asyncio.Queue()
+            self.__writer = None
+
+    def __repr__(self) -> str:
+        return f'ConnectionPool(database={self.__database}, readers={self.__reader_count}, open={self.is_open})'
+
+
+pool: ConnectionPool = ConnectionPool(
+    database_cfg.path,
+    database_cfg.readers,
+    commit_interval=database_cfg.commit_interval,
+    commit_batch=database_cfg.commit_batch,
+    pragmas=database_cfg.pragmas
+)
@@ -1,5 +1,7 @@
+from collections import OrderedDict
 from datetime import datetime
-from typing import Final
+from functools import cache
+from typing import Final, Optional
 
 from discord import User, Embed, Color
 from discord.ext import commands
@@ -11,6 +13,9 @@ from common.data.settings import discord_cfg as dcfg
 ERR_DELAY: Final = 8
 SUCCESS_DELAY: Final = 20
 
+_STATUS_RENDER_CACHE_SIZE: Final = 256
+_status_renders: OrderedDict[tuple, Embed] = OrderedDict()
+
 ARG_ERR: Final = Embed(
     title='Missing Information',
     description='Oops! Looks like you are missing an argument.',
@@ -104,12 +109,33 @@ IMAGE_NOT_FOUND: Final = Embed(
 
 
 async def create_status_message(user_data: UserEntry, *, image_url: str = None, greeter: User = None) -> Embed:
+    """
+    Renders the status message embed of `user_data`. Renders are cached by everything they display, so rendering an
+    unchanged status message again only copies the cached embed and refreshes its timestamp.
+    """
     user: User = await user_data.user
+    key = (
+        user.id, user.name, user.discriminator, user.avatar.url,
+        user_data.first_name, user_data.last_name, user_data.psu_email, user_data.status,
+        image_url, greeter and (greeter.id, greeter.display_name)
+    )
+    if (embed := _status_renders.get(key)) is None:
+        embed = _render_status_message(user, user_data, image_url, greeter)
+        _status_renders[key] = embed
+        if len(_status_renders) > _STATUS_RENDER_CACHE_SIZE:
+            _status_renders.popitem(last=False)
+    else:
+        _status_renders.move_to_end(key)
+    embed = embed.copy()
+    embed.timestamp = datetime.now()
+    return embed
+
+
+def _render_status_message(user: User, user_data: UserEntry, image_url: Optional[str], greeter: Optional[User]) -> Embed:
     embed = Embed(
         title=f'{user_data.first_name} {user_data.last_name} [ {user_data.psu_email} ]',
         description=f'***Discord Username:*** {user.mention} - {user.name}#{user.discriminator}\n'
-                    f'***Status:***           {user_data.status!r}',
-        timestamp=datetime.now()
+                    f'***Status:***           {user_data.status!r}'
     )
     embed.set_thumbnail(url=user.avatar.url)
     footer = ''
@@ -127,13 +153,28 @@ async def create_status_message(user_data: UserEntry, *, image_url: str = None,
     return embed
 
 
+@cache
+def _request_channel_mention() -> str:
+    return dcfg.request_channel_.mention
+
+
+def clear_guild_templates() -> None:
+    """
+    Drops the cached embeds and text built from the operating discord and its request channel. Must be called
+    whenever either changes. Cached embeds are shared between callers, so they must not be modified.
+    """
+    _request_channel_mention.cache_clear()
+    not_in_dms.cache_clear()
+    email_timeout.cache_clear()
+
+
 def email_undelivered(provided_email: str):
     return Embed(
         title='Oops! Your email seems to be incorrect.',
         description=f'We tried sending you a verification email to *{provided_email}*, but this email could not be '
                     f'reached. If you believe this is a mistake, please contact a greeter or admin. Otherwise, '
                     f'if that email address is mistakenly wrong, please use `!update email <psu email> <confirm email>` '
-                    f'in {dcfg.request_channel_.mention}.',
+                    f'in {_request_channel_mention()}.',
         color=Color.red()
     )
 
@@ -164,6 +205,7 @@ def on_cooldown(seconds_left: int) -> Embed:
     )
 
 
+@cache
 def not_in_dms() -> Embed:
     return Embed(
         title='Cannot process extensions in DMs',
@@ -173,6 +215,7 @@ def not_in_dms() -> Embed:
     )
 
 
+@cache
 def email_timeout() -> Embed:
     return Embed(
         title='Are you there?',
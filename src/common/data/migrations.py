@@ -0,0 +1,92 @@
+import logging
+
+import aiosqlite as sqlite
+
+from common.exceptions import UnknownSchemaVersion
+
+
+log = logging.getLogger(__name__)
+
+# Ordered schema migrations. The migration at index i upgrades the database from `PRAGMA user_version` i to i + 1.
+# Released migrations must never be edited or reordered - add a new migration to the end of the list instead.
+_migrations: list[str] = [
+    # 1 - initial schema
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id UNSIGNED BIG INT PRIMARY KEY,
+        joined_timestamp FLOAT NOT NULL,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        psu_email TEXT NOT NULL UNIQUE,
+        status_msg_id UNSIGNED BIG INT NOT NULL,
+        dm_channel_id UNSIGNED BIG INT NOT NULL,
+        status TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS images (
+        user_ref_id UNSIGNED BIG INT,
+        url TEXT NOT NULL UNIQUE,
+        FOREIGN KEY(user_ref_id) REFERENCES users(user_id)
+    );
+    """,
+    # 2 - status and image lookups
+    """
+    CREATE INDEX IF NOT EXISTS users_status_idx ON users(status);
+    CREATE INDEX IF NOT EXISTS images_user_ref_id_idx ON images(user_ref_id);
+    """,
+    # 3 - keyset pagination of users by status
+    """
+    CREATE INDEX IF NOT EXISTS users_status_joined_idx ON users(status, joined_timestamp, user_id);
+    DROP INDEX IF EXISTS users_status_idx;
+    """,
+    # 4 - verification email outbox
+    """
+    CREATE TABLE IF NOT EXISTS outbox (
+        email_id INTEGER PRIMARY KEY,
+        user_ref_id UNSIGNED BIG INT NOT NULL,
+        email TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt FLOAT NOT NULL,
+        FOREIGN KEY(user_ref_id) REFERENCES users(user_id) ON DELETE CASCADE
+    );
+    CREATE INDEX IF NOT EXISTS outbox_next_attempt_idx ON outbox(next_attempt);
+    """,
+    # 5 - status messages are looked up by id when their components are used
+    """
+    CREATE INDEX IF NOT EXISTS users_status_msg_idx ON users(status_msg_id);
+    """,
+    # 6 - keyset pagination of users in join order; an index led by status cannot order a multi-status page
+    """
+    CREATE INDEX IF NOT EXISTS users_joined_idx ON users(joined_timestamp, user_id);
+    """,
+]
+
+SCHEMA_VERSION: int = len(_migrations)
+
+
+async def schema_version(conn: sqlite.Connection) -> int:
+    async with conn.execute('PRAGMA user_version') as cur:
+        version, = await cur.fetchone()
+        return version
+
+
+async def migrate(conn: sqlite.Connection) -> int:
+    """
+    Brings the database up to `SCHEMA_VERSION` by applying every migration newer than the database's
+    `PRAGMA user_version`. Each migration is applied in its own transaction along with its version bump, so a failed
+    migration leaves the database at the last successfully applied version.
+
+    :param conn: The connection to migrate the database with.
+    :return: The schema version of the database after migrating.
+    :raises UnknownSchemaVersion: Raised if the database was migrated by a newer version of the bot.
+    """
+    version = await schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise UnknownSchemaVersion(version, SCHEMA_VERSION)
+    for target, script in enumerate(_migrations[version:], start=version + 1):
+        try:
+            await conn.executescript(f'BEGIN; {script} PRAGMA user_version = {target}; COMMIT;')
+        except sqlite.Error:
+            await conn.rollback()
+            raise
+        log.info('Migrated database to schema version %d', target)
+    return SCHEMA_VERSION
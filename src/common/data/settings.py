@@ -1,3 +1,5 @@
+from typing import Literal, Union
+
 from discord import Guild, TextChannel, Role
 from discord.ext import commands
 from pydantic import BaseModel
@@ -15,6 +17,12 @@ class _DiscordSettings(BaseModel):
     activity: str
     email_response_timeout: int
     email_refresh_rate: float
+    status_edit_window: float = 0.5
+    resolver_ttl: float = 900
+    resolver_cache_size: int = 1024
+    status_view_dispatcher: bool = False
+    status_view_idle_timeout: float = 900
+    rehydration_concurrency: int = 8
 
     @classmethod
     def finalize(cls, bot: commands.Bot):
@@ -50,6 +58,47 @@ class _DiscordSettings(BaseModel):
 class _GoogleSettings(BaseModel):
     email: str
     password: str
+    smtp_host: str = 'smtp.gmail.com'
+    smtp_port: int = 587
+    imap_host: str = 'imap.gmail.com'
+    imap_port: int = 993
+    mailbox: str = '"[Gmail]/All Mail"'
+    use_tls: bool = True
+    push_mode: bool = False
+    idle_timeout: float = 600
+    idle_max_backoff: float = 300
+    send_rate: int = 60
+    send_max_backoff: float = 300
+    outbox_interval: float = 30
+    outbox_max_backoff: float = 3600
+    outbox_max_attempts: int = 10
+
+    class Config:
+        allow_mutation = False
+
+
+class _DatabaseSettings(BaseModel):
+    path: str = '../user_entry.db'
+    readers: int = 4
+    commit_interval: float = 0.05
+    commit_batch: int = 32
+    user_cache_size: int = 512
+    page_size: int = 100
+    journal_mode: Literal['delete', 'truncate', 'persist', 'memory', 'wal', 'off'] = 'wal'
+    synchronous: Literal['off', 'normal', 'full', 'extra'] = 'normal'
+    cache_size: int = -2000
+    mmap_size: int = 0
+    busy_timeout: int = 5000
+
+    @property
+    def pragmas(self) -> dict[str, Union[str, int]]:
+        return {
+            'journal_mode': self.journal_mode,
+            'synchronous': self.synchronous,
+            'cache_size': self.cache_size,
+            'mmap_size': self.mmap_size,
+            'busy_timeout': self.busy_timeout
+        }
 
     class Config:
         allow_mutation = False
@@ -58,12 +107,13 @@ class _GoogleSettings(BaseModel):
 class _BotSettings(BaseModel):
     discord: _DiscordSettings
     google: _GoogleSettings
+    database: _DatabaseSettings = _DatabaseSettings()
 
-    def as_tuple(self) -> tuple[_DiscordSettings, _GoogleSettings]:
-        return self.discord, self.google
+    def as_tuple(self) -> tuple[_DiscordSettings, _GoogleSettings, _DatabaseSettings]:
+        return self.discord, self.google, self.database
 
     class Config:
         allow_mutation = False
 
 
-discord_cfg, google_cfg = _BotSettings.parse_file('../config.json').as_tuple()
+discord_cfg, google_cfg, database_cfg = _BotSettings.parse_file('../config.json').as_tuple()
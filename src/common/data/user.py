@@ -1,11 +1,13 @@
+from collections import OrderedDict
 from collections.abc import Callable, Awaitable
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Final
 
-from discord import User, Message, DMChannel
+from discord import User, Member, Message, PartialMessage, DMChannel
 from discord.ext import commands
 
+from common.bot.resolver import resolver
 from common.bot.userstatus import UserStatus
 from common.data.settings import discord_cfg
 from common.data.userdb import UserEntryManager
@@ -13,8 +15,22 @@ from common.data.userdetails import UserDetails
 
 UserInitializationCallback = Callable[[commands.Context], Awaitable[tuple[int, int]]]
 
+_STATUS_MESSAGE_CACHE_SIZE: Final = 128
+_status_messages: OrderedDict[int, Message] = OrderedDict()
 
-@dataclass
+
+def cache_status_message(message: Message) -> None:
+    """
+    Keeps a fetched or edited status message so that `UserEntry.fetch_status_message` can return it without a REST
+    call. Only the most recently cached `_STATUS_MESSAGE_CACHE_SIZE` messages are kept.
+    """
+    _status_messages[message.id] = message
+    _status_messages.move_to_end(message.id)
+    if len(_status_messages) > _STATUS_MESSAGE_CACHE_SIZE:
+        _status_messages.popitem(last=False)
+
+
+@dataclass(slots=True)
 class UserEntry:
     user_details: UserDetails
     bot: Optional[commands.Bot] = field(default=None, kw_only=True)
@@ -30,7 +46,7 @@ class UserEntry:
         """
         :return: Returns the User's internal discord User.
         """
-        return self.bot.get_user(self.user_id) or await self.bot.fetch_user(self.user_id)
+        return await resolver.user(self.bot, self.user_id)
 
     @property
     def joined(self) -> datetime:
@@ -56,22 +72,41 @@ class UserEntry:
         return self.user_details.status_msg_id
 
     @property
-    async def status_message(self) -> Message:
+    def status_message(self) -> PartialMessage:
+        """
+        :return: Returns a handle to the User's status message. The handle can be edited without fetching the message.
+        """
+        return discord_cfg.admin_channel_.get_partial_message(self.status_message_id)
+
+    async def fetch_status_message(self) -> Message:
         """
-        :return: Returns the User's status message as a discord internal Message.
+        :return: Returns the User's status message as a discord internal Message, with its content. The message is only
+        fetched if it is not cached.
         """
-        return await discord_cfg.admin_channel_.fetch_message(self.status_message_id)
+        if (message := _status_messages.get(self.status_message_id)) is None:
+            message = await discord_cfg.admin_channel_.fetch_message(self.status_message_id)
+            cache_status_message(message)
+        return message
 
     @property
     def dm_channel_id(self) -> int:
         return self.user_details.dm_channel_id
 
+    @property
+    async def member(self) -> Member:
+        """
+        :return: Returns the User's internal discord Member of the operating discord.
+        """
+        return await resolver.member(discord_cfg.operating_discord_, self.user_id)
+
     @property
     async def dm_channel(self) -> DMChannel:
         """
-        :return: Returns the User's direct message channel as a discord internal DMChannel.
+        :return: Returns the User's direct message channel as a discord internal DMChannel. The channel is created if
+        the client has not cached it.
         """
-        return (await self.user).dm_channel
+        user = await self.user
+        return user.dm_channel or await user.create_dm()
 
     @property
     def status(self) -> UserStatus:
@@ -87,7 +122,7 @@ class UserEntry:
 
     @classmethod
     async def from_user(cls, user: User, bot: commands.Bot = None) -> Optional['UserEntry']:
-        async with UserEntryManager(user) as _user:
+        async with UserEntryManager(user, read_only=True) as _user:
             if _user.is_registered:
                 return cls(await _user.get_entry(), bot=bot, is_registered=True)
         return None
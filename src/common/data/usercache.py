@@ -0,0 +1,117 @@
+from collections import Counter, OrderedDict
+from dataclasses import replace
+from typing import Optional
+
+from common.data.settings import database_cfg
+from common.data.userdetails import UserDetails
+
+
+class UserDetailsCache:
+    def __init__(self, max_size: int):
+        """
+        Bounded LRU cache of UserDetails keyed by user id. The least recently used entry is evicted once `max_size`
+        entries are cached.
+
+        Entries are copied going in and coming out, so changes made to a UserDetails by its holder never leak into
+        the cache without being written to the database.
+
+        Every invalidation advances the user's generation. A reader takes the generation before it queries the
+        database and passes it to `put`, which drops the entry if the user was written in the meantime, so a read
+        that raced a write can never cache the old row.
+
+        Writes are bracketed by `begin_write` and `end_write`. In between, the write may not be committed yet while
+        other contexts already see it on the shared writer connection, so the user is kept out of the cache entirely.
+
+        :param max_size: The maximum number of cached entries.
+        """
+        self.__entries: OrderedDict[int, UserDetails] = OrderedDict()
+        self.__max_size: int = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.__generations: dict[int, int] = {}
+        self.__cleared: int = 0
+        # Number of contexts with uncommitted writes to each user.
+        self.__writing: Counter[int] = Counter()
+
+    @staticmethod
+    def __copy(user_details: UserDetails) -> UserDetails:
+        return replace(user_details, image_urls=list(user_details.image_urls))
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self.__entries
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, user_id: int) -> Optional[UserDetails]:
+        """
+        :return: A copy of the cached UserDetails for `user_id`, or None if the user is not cached.
+        """
+        user_details = self.__entries.get(user_id)
+        if user_details is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.__entries.move_to_end(user_id)
+        return self.__copy(user_details)
+
+    def generation(self, user_id: int) -> int:
+        """
+        :return: A number that changes whenever `user_id` is invalidated.
+        """
+        return self.__cleared + self.__generations.get(user_id, 0)
+
+    def put(self, user_details: UserDetails, generation: int = None) -> None:
+        """
+        Caches `user_details`.
+
+        :param generation: The user's `generation` from before their data was read. The entry is not cached if the
+        user has been invalidated since.
+        """
+        if user_details.user_id in self.__writing:
+            return
+        if generation is not None and generation != self.generation(user_details.user_id):
+            return
+        self.__entries[user_details.user_id] = self.__copy(user_details)
+        self.__entries.move_to_end(user_details.user_id)
+        if len(self.__entries) > self.__max_size:
+            self.__entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        self.__entries.pop(user_id, None)
+        self.__generations[user_id] = self.__generations.get(user_id, 0) + 1
+
+    def begin_write(self, user_id: int) -> None:
+        """
+        Invalidates `user_id` and keeps them out of the cache until every `begin_write` is matched by an `end_write`.
+        """
+        self.invalidate(user_id)
+        self.__writing[user_id] += 1
+
+    def end_write(self, user_id: int) -> None:
+        """
+        Ends a write started with `begin_write`, once it is committed or rolled back, and invalidates `user_id` again
+        so entries read while the write was pending are never cached.
+        """
+        self.__writing[user_id] -= 1
+        if self.__writing[user_id] <= 0:
+            del self.__writing[user_id]
+        self.invalidate(user_id)
+
+    def clear(self) -> None:
+        self.__entries.clear()
+        self.__cleared += 1
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self) -> str:
+        return f'UserDetailsCache(size={len(self)}/{self.__max_size}, hits={self.hits}, misses={self.misses}, ' \
+               f'evictions={self.evictions})'
+
+
+user_cache: UserDetailsCache = UserDetailsCache(database_cfg.user_cache_size)
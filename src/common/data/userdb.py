@@ -1,5 +1,10 @@
+import asyncio
+import json
+import sys
+from contextlib import AbstractAsyncContextManager
 from functools import wraps
-from types import AsyncGeneratorType
+from collections.abc import Awaitable, Iterable, Iterator
+from time import time
 from typing import Optional, AsyncGenerator
 
 from discord import User
@@ -7,52 +12,106 @@ from discord import User
 import aiosqlite as sqlite
 
 from common.bot.userstatus import UserStatus
+from common.data.database import pool
+from common.data.settings import database_cfg
+from common.data.usercache import user_cache
 from common.data.userdetails import UserDetails
 from common.exceptions import UserMismatchError, UnregisteredUserError, InvalidGlobalOperation
 
 
+OutboxEmail = tuple[int, str, int]
+
+# Set whenever a committed context has queued an email in the outbox.
+outbox_ready: asyncio.Event = asyncio.Event()
+
 _columns: list[str] = ['user_id', 'joined_timestamp', 'first_name', 'last_name', 'psu_email', 'status_msg_id', 'dm_channel_id', 'status']
 _param_list: str = ''.join(['?, ' for _ in range(len(_columns))]).rstrip(', ')
+_unverified_statuses: tuple[UserStatus, ...] = tuple(s for s in UserStatus if s not in (UserStatus.VERIFIED, UserStatus.DENIED))
+
+
+# SQLite's default limit on bound parameters per statement is 999 in older builds.
+_max_params: int = 999
+_entry_query: str = """
+    SELECT users.*, (SELECT json_group_array(url) FROM images WHERE user_ref_id=users.user_id)
+    FROM users
+    WHERE user_id IN ({})
+    """
+
+
+_status_query: str = "SELECT * FROM users WHERE status IN ({})"
+
+
+# Unordered, so each status is looked up in users_status_joined_idx and only matching rows are read.
+_status_entries_query: str = """
+    SELECT users.*, (SELECT json_group_array(url) FROM images WHERE user_ref_id=users.user_id)
+    FROM users
+    WHERE status IN ({})
+    """
+
+
+_status_message_query: str = """
+    SELECT users.*, (SELECT json_group_array(url) FROM images WHERE user_ref_id=users.user_id)
+    FROM users
+    WHERE status_msg_id=?
+    """
+
+
+# `+status` keeps SQLite from looking the statuses up in users_status_joined_idx, which cannot return several
+# statuses in join order and forces a sort of every remaining row, images included, for each page. The page is read
+# in order from users_joined_idx instead, so images are only fetched for the rows in the page.
+_keyset_query: str = """
+    SELECT users.*, (SELECT json_group_array(url) FROM images WHERE user_ref_id=users.user_id)
+    FROM users
+    WHERE +status IN ({}) {}
+    ORDER BY joined_timestamp, user_id
+    LIMIT ?
+    """
+_after_key: str = 'AND (joined_timestamp, user_id) > (?, ?)'
+
+
+_due_emails_query: str = "SELECT email_id, email, attempts FROM outbox WHERE next_attempt<=? ORDER BY next_attempt LIMIT ?"
+_next_due_query: str = "SELECT min(next_attempt) FROM outbox WHERE next_attempt>?"
+
+
+def _placeholders(count: int) -> str:
+    return ', '.join('?' * count)
+
+
+def _chunks(values: list, size: int = _max_params) -> Iterator[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
 
+def _entry_from_row(row: tuple) -> UserDetails:
+    return UserDetails.from_row(row[:-1], json.loads(row[-1]))
 
-def user_operation(coro):
-    @wraps(coro)
-    def wrapper(*args, **kwargs):
-        self: UserEntryManager = args[0]
+
+def user_operation(operation):
+    """
+    Restricts `operation` to registered User contexts. The context is checked when the operation is called, and the
+    operation's coroutine or async generator is handed back to the caller as is, so the operation itself runs without
+    an extra wrapping frame.
+    """
+    @wraps(operation)
+    def wrapper(self: 'UserEntryManager', *args, **kwargs):
         if not self.is_registered:
             raise UnregisteredUserError(self.discord_user)
         if self.discord_user is None:
-            raise InvalidGlobalOperation(self, coro.__name__)
-
-        coro_inst = coro(*args, **kwargs)
-        if isinstance(coro_inst, AsyncGeneratorType):
-            async def inner():
-                async for val in coro_inst:
-                    yield val
-        else:
-            async def inner():
-                return await coro_inst
-        return inner()
+            raise InvalidGlobalOperation(self, operation.__name__)
+        return operation(self, *args, **kwargs)
     return wrapper
 
 
-def global_operation(coro):
-    @wraps(coro)
-    def wrapper(*args, **kwargs):
-        coro_inst = coro(*args, **kwargs)
-        if isinstance(coro_inst, AsyncGeneratorType):
-            async def inner():
-                async for val in coro_inst:
-                    yield val
-        else:
-            async def inner():
-                return await coro_inst
-        return inner()
-    return wrapper
+def global_operation(operation):
+    """
+    Marks `operation` as usable from both Global and User contexts. Global operations need no context checks, so the
+    operation is returned undecorated.
+    """
+    return operation
 
 
 class UserEntryManager:
-    def __init__(self, user: User = None):
+    def __init__(self, user: User = None, *, read_only: bool = False):
         """
         Database connection manager used for managing user data:\n
         Contexts - Global, User
@@ -64,43 +123,83 @@ class UserEntryManager:
         **User:** Specified if a discord user was passed to `__init__` \n
         A user context must be used in order to fetch data about a specific user.
 
+        Connections are borrowed from the process-wide `database.pool` for the lifetime of the context. A read only
+        context borrows one of the pool's read connections and may run alongside other contexts. Any other context
+        borrows the pool's writer, and exiting it waits until its changes are committed. Changes are rolled back if
+        the context exits with an exception.
+
+        A context that borrowed the writer may read rows that are not committed yet, so it only updates the
+        `user_cache` once its commit has succeeded, caching the entries it read or registered then. The users it
+        writes are kept out of the cache from the write until the context ends, so other writer contexts always read
+        them from the writer connection, which holds the uncommitted write.
+
         :param user: A discord User or None. Some operations cannot be executed if user is None.
+        :param read_only: Borrow a read connection instead of the writer. Write operations must not be used.
         """
         self.__user: Optional[User] = user
         self.__is_registered: bool = False
+        self.__read_only: bool = read_only
+        self.__queued_email: bool = False
+        # Users written by this context, mapped to their new UserDetails when known.
+        self.__touched: dict[int, Optional[UserDetails]] = {}
+        # Entries read by a writer context and the `user_cache` generation they were read at.
+        self.__reads: list[tuple[UserDetails, int]] = []
+        self.__borrowed: AbstractAsyncContextManager[sqlite.Connection]
         self.__conn: sqlite.Connection
 
     async def __aenter__(self):
         """
+        Borrows a connection from the pool and checks whether the context User is registered. Users held in the
+        `user_cache` are known to be registered without querying the database. Otherwise, the User's entry is fetched
+        and cached by the same query that checks registration, so a following `get_entry` is served from the cache.
 
-        :return:
+        :return: This UserEntryManager.
         """
-        self.__conn = await sqlite.connect('../user_entry.db')
-        await self.__conn.executescript(
-            """
-            PRAGMA foreign_keys = ON;
-            CREATE TABLE IF NOT EXISTS users (
-                user_id UNSIGNED BIG INT PRIMARY KEY,
-                joined_timestamp FLOAT NOT NULL,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                psu_email TEXT NOT NULL UNIQUE,
-                status_msg_id UNSIGNED BIG INT NOT NULL,
-                dm_channel_id UNSIGNED BIG INT NOT NULL,
-                status TEXT NOT NULL
-            );
-            CREATE TABLE IF NOT EXISTS images (
-                user_ref_id UNSIGNED BIG INT,
-                url TEXT NOT NULL UNIQUE,
-                FOREIGN KEY(user_ref_id) REFERENCES users(user_id)
-            );
-            """)
-        if self.__user is not None:
-            async with self.__conn.execute("SELECT EXISTS(SELECT 1 FROM users WHERE user_id=?)", (self.__user.id,)) as cur:
-                row_exists, = await cur.fetchone()
-                self.__is_registered = bool(row_exists)
+        self.__borrowed = pool.reader() if self.__read_only else pool.writer()
+        self.__conn = await self.__borrowed.__aenter__()
+        try:
+            if self.__user is not None and self.__user.id in user_cache:
+                self.__is_registered = True
+            elif self.__user is not None:
+                generation = user_cache.generation(self.__user.id)
+                if (user_details := await self.__select_entry()) is not None:
+                    self.__cache(user_details, generation)
+                    self.__is_registered = True
+        except BaseException:
+            # __aexit__ is not called when __aenter__ raises, so the connection must be returned here.
+            await self.__borrowed.__aexit__(*sys.exc_info())
+            raise
         return self
 
+    async def __select_entry(self) -> Optional[UserDetails]:
+        """
+        Fetches the context User's row and images in a single query.
+
+        :return: The context User's UserDetails, or None if the User is not registered.
+        """
+        async with self.__conn.execute(_entry_query.format('?'), (self.__user.id,)) as cur:
+            row = await cur.fetchone()
+        return None if row is None else _entry_from_row(row)
+
+    def __cache(self, user_details: UserDetails, generation: int):
+        """
+        Caches `user_details`, read at `user_cache` generation `generation`. A writer context defers this until its
+        commit succeeds.
+        """
+        if self.__read_only:
+            user_cache.put(user_details, generation)
+        else:
+            self.__reads.append((user_details, generation))
+
+    def __touch(self, user_id: int, user_details: UserDetails = None):
+        """
+        Records that this context wrote `user_id`, whose data is now `user_details` if given. The user is kept out of
+        the `user_cache` until the context ends, so no context reads an entry older than the uncommitted write.
+        """
+        if user_id not in self.__touched:
+            user_cache.begin_write(user_id)
+        self.__touched[user_id] = user_details
+
     @property
     def is_registered(self) -> bool:
         return self.__is_registered
@@ -110,11 +209,97 @@ class UserEntryManager:
         return self.__user
 
     @global_operation
-    async def get_unverified_users(self) -> AsyncGenerator[UserDetails, None]:
-        not_statuses = (UserStatus.VERIFIED.name, UserStatus.DENIED.name)
-        async with self.__conn.execute("SELECT * FROM users WHERE status!=? OR status!=?", not_statuses) as cur:
+    async def get_users_with_status(self, *statuses: UserStatus) -> AsyncGenerator[UserDetails, None]:
+        """
+        Fetches every user whose status is one of `statuses`. The lookup is served by the index on `users.status`.
+        The context's connection is held until iteration finishes; consumers that do slow work between users should
+        use `iter_users_with_status` instead.
+
+        :param statuses: The statuses to filter users by.
+        :return: An async generator of UserDetails for each matching user.
+        """
+        params = tuple(status.name for status in statuses)
+        async with self.__conn.execute(_status_query.format(_placeholders(len(params))), params) as cur:
             async for vals in cur:
-                yield UserDetails(*vals)
+                yield UserDetails.from_row(vals)
+
+    @global_operation
+    def get_unverified_users(self) -> AsyncGenerator[UserDetails, None]:
+        """
+        Fetches every user that has not been verified or denied.
+        """
+        return self.get_users_with_status(*_unverified_statuses)
+
+    @global_operation
+    async def get_entries(self, user_ids: Iterable[int]) -> list[UserDetails]:
+        """
+        Fetches the UserDetails of many users at once. Users held in the `user_cache` are served from the cache, and
+        the rest are fetched with their images in as few queries as SQLite's parameter limit allows.
+
+        :param user_ids: The ids of the users to fetch.
+        :return: The UserDetails of every registered user in `user_ids`, in the order given. Unregistered ids are
+        skipped.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        found: dict[int, UserDetails] = {}
+        missing = []
+        for user_id in user_ids:
+            if user_id not in self.__touched and (user_details := user_cache.get(user_id)) is not None:
+                found[user_id] = user_details
+            else:
+                missing.append(user_id)
+        generations = {user_id: user_cache.generation(user_id) for user_id in missing}
+        for chunk in _chunks(missing):
+            async with self.__conn.execute(_entry_query.format(_placeholders(len(chunk))), chunk) as cur:
+                async for row in cur:
+                    user_details = _entry_from_row(row)
+                    self.__cache(user_details, generations[user_details.user_id])
+                    found[user_details.user_id] = user_details
+        return [found[user_id] for user_id in user_ids if user_id in found]
+
+    async def __existing_users(self, user_ids: list[int]) -> set[int]:
+        """
+        :return: The ids in `user_ids` that have a row in the users table.
+        """
+        existing = set()
+        for chunk in _chunks(user_ids):
+            async with self.__conn.execute(f"SELECT user_id FROM users WHERE user_id IN ({_placeholders(len(chunk))})", chunk) as cur:
+                existing.update([user_id async for user_id, in cur])
+        return existing
+
+    @global_operation
+    async def register_many(self, user_entries: Iterable[UserDetails]) -> list[UserDetails]:
+        """
+        Adds many UserEntries, along with their images, to the database at once. Entries belonging to users that are
+        already registered, or whose psu email is already taken, are ignored.
+
+        :param user_entries: The UserEntries to add to the database.
+        :return: The UserEntries that were added.
+        """
+        user_entries = list({user_entry.user_id: user_entry for user_entry in user_entries}.values())
+        registered = await self.__existing_users([user_entry.user_id for user_entry in user_entries])
+        candidates = [user_entry for user_entry in user_entries if user_entry.user_id not in registered]
+        await self.__conn.executemany(f"INSERT OR IGNORE INTO users VALUES ({_param_list})", [user_entry.to_row() for user_entry in candidates])
+        # Candidates were not registered before, so the ones that exist now are exactly the rows that were inserted.
+        inserted = await self.__existing_users([user_entry.user_id for user_entry in candidates])
+        added = [user_entry for user_entry in candidates if user_entry.user_id in inserted]
+        await self.__conn.executemany(
+            "INSERT OR IGNORE INTO images (user_ref_id, url) VALUES (?, ?)",
+            [(user_entry.user_id, url) for user_entry in added for url in dict.fromkeys(user_entry.image_urls)])
+        for user_entry in added:
+            self.__touch(user_entry.user_id, user_entry)
+        return added
+
+    @global_operation
+    async def update_many(self, statuses: dict[int, UserStatus]):
+        """
+        Updates the status of many users at once.
+
+        :param statuses: Maps the id of each user to update to the user's new status.
+        """
+        for user_id in statuses:
+            self.__touch(user_id)
+        await self.__conn.executemany("UPDATE users SET status=? WHERE user_id=?", [(status.name, user_id) for user_id, status in statuses.items()])
 
     @global_operation
     async def register(self, user_entry: UserDetails):
@@ -123,10 +308,13 @@ class UserEntryManager:
 
         :param user_entry: The UserEntry to add to the database.
         """
-        await self.__conn.execute(f"INSERT OR IGNORE INTO users VALUES ({_param_list})", user_entry.to_row())
+        async with self.__conn.execute(f"INSERT OR IGNORE INTO users VALUES ({_param_list})", user_entry.to_row()) as cur:
+            inserted = cur.rowcount == 1
         if self.__user is not None:
             self.__is_registered = True
         await self.update_images(user_entry.image_urls)
+        if inserted:
+            self.__touch(user_entry.user_id, user_entry)
 
     @user_operation
     async def get_images(self) -> list[str]:
@@ -143,29 +331,40 @@ class UserEntryManager:
         """
         Deletes all images associated with the context User.
         """
+        self.__touch(self.__user.id)
         await self.__conn.execute("DELETE FROM images WHERE user_ref_id=?", (self.__user.id,))
 
     @user_operation
     async def update_images(self, image_url_list: list[str]):
         """
-        Updates the list of images associated with the context User.
+        Updates the list of images associated with the context User. Only the difference between the stored images
+        and `image_url_list` is written, and the image table is left untouched if nothing changed.
 
         :param image_url_list: A list of urls to insert into the image table.
         """
-        await self.delete_images()
-        for url in image_url_list:
-            await self.__conn.execute("INSERT OR IGNORE INTO images (user_ref_id, url) VALUES (?, ?)", (self.__user.id, url))
+        stored = set(await self.get_images())
+        removed = stored.difference(image_url_list)
+        added = [url for url in dict.fromkeys(image_url_list) if url not in stored]
+        if removed or added:
+            self.__touch(self.__user.id)
+        if removed:
+            await self.__conn.executemany("DELETE FROM images WHERE user_ref_id=? AND url=?", [(self.__user.id, url) for url in removed])
+        if added:
+            await self.__conn.executemany("INSERT OR IGNORE INTO images (user_ref_id, url) VALUES (?, ?)", [(self.__user.id, url) for url in added])
 
     @user_operation
     async def get_entry(self) -> UserDetails:
         """
-        Fetches a the context User's UserEntry from the database.
+        Fetches a the context User's UserEntry from the `user_cache`, or from the database on a cache miss.
 
         :return: Returns a UserEntry with the data of the context User.
         """
-        async with self.__conn.execute("SELECT * FROM users WHERE user_id=?", (self.__user.id,)) as cur:
-            vals, urls = await cur.fetchone(), await self.get_images()
-            return UserDetails(*vals, urls)
+        if self.__user.id not in self.__touched and (user_details := user_cache.get(self.__user.id)) is not None:
+            return user_details
+        generation = user_cache.generation(self.__user.id)
+        if (user_details := await self.__select_entry()) is not None:
+            self.__cache(user_details, generation)
+        return user_details
 
     @user_operation
     async def update_entry(self, user_entry: UserDetails):
@@ -178,6 +377,7 @@ class UserEntryManager:
         """
         if self.__user.id != user_entry.user_id:
             raise UserMismatchError(user_entry, self.__user)
+        self.__touch(self.__user.id)
         await self.__conn.execute(
             """
             UPDATE users
@@ -198,20 +398,166 @@ class UserEntryManager:
         """
         Removes the context User from the database.
         """
+        self.__touch(self.__user.id)
         await self.delete_images()
         await self.__conn.execute("DELETE FROM users WHERE user_id=?", (self.__user.id,))
 
+    @user_operation
+    async def queue_verification_email(self):
+        """
+        Queues a verification email to the context User's psu email in the outbox. The email is committed along with
+        the rest of the context's writes, e.g. the User's registration, and is sent by the outbox worker afterwards.
+        """
+        await self.__conn.execute(
+            "INSERT INTO outbox (user_ref_id, email, next_attempt) SELECT user_id, psu_email, ? FROM users WHERE user_id=?",
+            (time(), self.__user.id))
+        self.__queued_email = True
+
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.__conn.commit()
-        await self.__conn.close()
+        try:
+            await self.__borrowed.__aexit__(exc_type, exc_val, exc_tb)
+        except BaseException:
+            self.__end_writes()
+            raise
+        self.__end_writes()
+        if exc_type is not None:
+            return
+        self.__update_cache()
+        if self.__queued_email:
+            outbox_ready.set()
+
+    def __end_writes(self):
+        for user_id in self.__touched:
+            user_cache.end_write(user_id)
+
+    def __update_cache(self):
+        """
+        Applies the context's changes to the `user_cache` once they are committed. Nothing is applied if the
+        context's writes were rolled back, since the cache only ever holds committed data.
+        """
+        for user_id, user_details in self.__touched.items():
+            if user_details is not None:
+                user_cache.put(user_details)
+        for user_details, generation in self.__reads:
+            if user_details.user_id not in self.__touched:
+                user_cache.put(user_details, generation)
 
     def __repr__(self) -> str:
         context = 'Global' if self.__user is None else 'User'
         return f'UserDataManager(context={context}, user={self.__user}, user_registered={self.__is_registered})'
 
 
+async def iter_users_with_status(*statuses: UserStatus, page_size: int = None) -> AsyncGenerator[UserDetails, None]:
+    """
+    Iterates over every user whose status is one of `statuses`, ordered by join time. Users are fetched a page at a
+    time using keyset pagination on `(joined_timestamp, user_id)`, and a read connection is only borrowed from the pool
+    while a page is fetched, so the consumer may do slow work between users without pinning the database.
+
+    :param statuses: The statuses to filter users by.
+    :param page_size: The number of users fetched per page. Defaults to `page_size` from the database config.
+    :return: An async generator of UserDetails, including images, for each matching user.
+    """
+    page_size = page_size or database_cfg.page_size
+    status_params = tuple(status.name for status in statuses)
+    first_page = _keyset_query.format(_placeholders(len(status_params)), '')
+    next_page = _keyset_query.format(_placeholders(len(status_params)), _after_key)
+    key = None
+    while True:
+        async with pool.reader() as conn:
+            query, params = (first_page, status_params) if key is None else (next_page, (*status_params, *key))
+            async with conn.execute(query, (*params, page_size)) as cur:
+                rows = await cur.fetchmany(page_size)
+        for row in rows:
+            yield _entry_from_row(row)
+        if len(rows) < page_size:
+            return
+        key = rows[-1][1], rows[-1][0]
+
+
+def iter_unverified_users(page_size: int = None) -> AsyncGenerator[UserDetails, None]:
+    """
+    Iterates over every user that has not been verified or denied. See `iter_users_with_status`.
+    """
+    return iter_users_with_status(*_unverified_statuses, page_size=page_size)
+
+
+async def fetch_users_with_status(*statuses: UserStatus) -> list[UserDetails]:
+    """
+    Fetches every user whose status is one of `statuses` in a single query, in no particular order. Prefer
+    `iter_users_with_status` unless every user is needed at once, or users are needed in join order.
+
+    :return: A list of UserDetails, including images, for each matching user.
+    """
+    status_params = tuple(status.name for status in statuses)
+    async with pool.reader() as conn:
+        async with conn.execute(_status_entries_query.format(_placeholders(len(status_params))), status_params) as cur:
+            return [_entry_from_row(row) for row in await cur.fetchall()]
+
+
+def fetch_unverified_users() -> Awaitable[list[UserDetails]]:
+    """
+    Fetches every user that has not been verified or denied. See `fetch_users_with_status`.
+    """
+    return fetch_users_with_status(*_unverified_statuses)
+
+
+async def get_entry_by_status_message(message_id: int) -> Optional[UserDetails]:
+    """
+    Fetches the user whose status message has id `message_id`, including images. The entry is not cached, since the
+    user's id, and so their `user_cache` generation, is not known before the query.
+
+    :return: The user's UserDetails, or None if no registered user has that status message.
+    """
+    async with pool.reader() as conn:
+        async with conn.execute(_status_message_query, (message_id,)) as cur:
+            row = await cur.fetchone()
+    return None if row is None else _entry_from_row(row)
+
+
+async def due_emails(limit: int = 100) -> list[OutboxEmail]:
+    """
+    Fetches the outbox emails whose next send attempt is due.
+
+    :param limit: The maximum number of emails to fetch.
+    :return: A list of `(email_id, email, attempts)` ordered by when they are due.
+    """
+    async with pool.reader() as conn:
+        async with conn.execute(_due_emails_query, (time(), limit)) as cur:
+            return list(await cur.fetchall())
+
+
+async def next_email_due() -> Optional[float]:
+    """
+    :return: The timestamp of the earliest send attempt in the outbox that is not yet due, or None if there is none.
+    """
+    async with pool.reader() as conn:
+        async with conn.execute(_next_due_query, (time(),)) as cur:
+            due, = await cur.fetchone()
+            return due
+
+
+async def complete_email(email_id: int):
+    """
+    Removes an email from the outbox once it is sent or given up on.
+    """
+    async with pool.writer() as conn:
+        await conn.execute("DELETE FROM outbox WHERE email_id=?", (email_id,))
+
+
+async def retry_email(email_id: int, attempts: int, delay: float):
+    """
+    Reschedules an outbox email after a failed send attempt.
+
+    :param email_id: The outbox email to reschedule.
+    :param attempts: The number of failed attempts so far.
+    :param delay: Seconds until the next attempt.
+    """
+    async with pool.writer() as conn:
+        await conn.execute("UPDATE outbox SET attempts=?, next_attempt=? WHERE email_id=?", (attempts, time() + delay, email_id))
+
+
 async def is_registered(user: User):
-    async with UserEntryManager(user) as _user:
+    async with UserEntryManager(user, read_only=True) as _user:
         return _user.is_registered
 
 
@@ -1,7 +1,9 @@
-from dataclasses import dataclass, field, astuple
+from dataclasses import dataclass, field
 
+Row = tuple[int, float, str, str, str, int, int, str]
 
-@dataclass
+
+@dataclass(slots=True)
 class UserDetails:
     user_id: int
     joined_timestamp: float
@@ -13,5 +15,10 @@ class UserDetails:
     status: str
     image_urls: list[str] = field(default_factory=list)
 
-    def to_row(self) -> tuple[int, float, str, str, str, int, int, str]:
-        return astuple(self)[:-1]
+    @classmethod
+    def from_row(cls, row: Row, image_urls: list[str] = None) -> 'UserDetails':
+        return cls(*row, [] if image_urls is None else image_urls)
+
+    def to_row(self) -> Row:
+        return (self.user_id, self.joined_timestamp, self.first_name, self.last_name, self.psu_email,
+                self.status_msg_id, self.dm_channel_id, self.status)
@@ -29,3 +29,17 @@ class ConfirmationEmailMismatch(Exception):
         super().__init__(f'{email} and {confirmation} do not match for user {user}.')
         self.email = email
         self.confirmation = confirmation
+
+
+class UnknownSchemaVersion(Exception):
+    def __init__(self, version: int, latest: int):
+        super().__init__(f'Database schema version {version} is newer than the latest known version {latest}.')
+        self.version = version
+        self.latest = latest
+
+
+class TransactionAborted(Exception):
+    def __init__(self, cause: BaseException = None):
+        super().__init__(f'The shared write transaction was aborted by SQLite and its uncommitted writes were lost'
+                         f'{"" if cause is None else f": {cause!r}"}.')
+        self.cause = cause
@@ -0,0 +1,114 @@
+"""
+Size and allocation benchmark for the slotted UserDetails and UserEntry of `common.data`.
+
+The slotted classes are compared with the same dataclasses without slots, whose `to_row` went through
+`dataclasses.astuple`, reporting per-instance size, the memory held by many loaded entries, and the time and transient
+memory of converting to and from database rows.
+
+Usage (from src/): python -m devtools.detailsbench --entries 10000 --images 3
+"""
+import argparse
+import sys
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import astuple, dataclass, field
+from typing import Optional
+
+from common.data.user import UserEntry
+from common.data.userdetails import Row, UserDetails
+
+
+@dataclass
+class _DictUserDetails:
+    user_id: int
+    joined_timestamp: float
+    first_name: str
+    last_name: str
+    psu_email: str
+    status_msg_id: int
+    dm_channel_id: int
+    status: str
+    image_urls: list[str] = field(default_factory=list)
+
+    def to_row(self) -> Row:
+        return astuple(self)[:-1]
+
+
+@dataclass
+class _DictUserEntry:
+    user_details: _DictUserDetails
+    bot: Optional[object] = field(default=None, kw_only=True)
+    partially_initialized: bool = field(default=False, kw_only=True)
+    is_registered: bool = field(default=False, kw_only=True)
+
+
+def _row(i: int) -> Row:
+    return i, 1.6e9 + i, 'Test', f'User{i}', f'tu{i}@psu.edu', 10 ** 18 + i, 10 ** 17 + i, 'PENDING_BOTH'
+
+
+def _images(i: int, images: int) -> list[str]:
+    return [f'https://canvas.psu.edu/images/{i}/{n}.png' for n in range(images)]
+
+
+def _instance_size(obj) -> int:
+    return sys.getsizeof(obj) + (sys.getsizeof(obj.__dict__) if hasattr(obj, '__dict__') else 0)
+
+
+def _held(build: Callable[[int], object], entries: int) -> int:
+    """
+    :return: Bytes still allocated after building `entries` objects with `build`.
+    """
+    tracemalloc.start()
+    held = [build(i) for i in range(entries)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def _transient(call: Callable[[], object]) -> int:
+    """
+    :return: Peak bytes allocated by a single `call`, including memory freed before it returns.
+    """
+    call()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - before
+
+
+def benchmark(entries: int, images: int):
+    slotted = UserDetails.from_row(_row(0), _images(0, images))
+    unslotted = _DictUserDetails(*_row(0), _images(0, images))
+    row = _row(0)
+    number = 100000
+
+    def report(measure: str, new: float, old: float, unit: str):
+        print(f'{measure:<30}{old:>12.2f}{unit:<4}{new:>12.2f}{unit:<4}{old / new:>8.1f}x')
+
+    print(f'{"":<30}{"unslotted":>16}{"slotted":>16}{"ratio":>9}')
+    report('UserDetails size', _instance_size(slotted), _instance_size(unslotted), 'B')
+    report('UserEntry size', _instance_size(UserEntry(slotted)), _instance_size(_DictUserEntry(unslotted)), 'B')
+    report(f'{entries} entries held',
+           _held(lambda i: UserEntry(UserDetails.from_row(_row(i), _images(i, images))), entries) / 2 ** 20,
+           _held(lambda i: _DictUserEntry(_DictUserDetails(*_row(i), _images(i, images))), entries) / 2 ** 20, 'MB')
+    report('to_row time', timeit.timeit(slotted.to_row, number=number) / number * 1e6,
+           timeit.timeit(unslotted.to_row, number=number) / number * 1e6, 'us')
+    report('to_row transient memory', _transient(slotted.to_row), _transient(unslotted.to_row), 'B')
+    report('from_row time', timeit.timeit(lambda: UserDetails.from_row(row), number=number) / number * 1e6,
+           timeit.timeit(lambda: _DictUserDetails(*row), number=number) / number * 1e6, 'us')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--images', type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.entries, args.images)
+
+
+if __name__ == '__main__':
+    main()
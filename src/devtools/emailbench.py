@@ -0,0 +1,79 @@
+"""
+End-to-end throughput benchmark for the email subsystem, run against a local FakeMailServer instead of Gmail.
+
+Simulated users are sent verification emails, a share of them reply or bounce, and replies are then polled for with
+`Gmail.check_for_replies`, reporting send throughput, IMAP IDLE wake latency and per-cycle poll latency.
+
+Usage (from src/): python -m devtools.emailbench --users 2000 --reply-rate 0.8 --bounce-rate 0.05
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from common.bot.email import Gmail
+from common.data.settings import google_cfg
+from common.data.user import UserEntry
+from common.data.userdetails import UserDetails
+from devtools.fakemail import FakeMailServer
+
+
+def _subject(psu_email: str) -> str:
+    return f'{Gmail.email_subject} - {psu_email}'
+
+
+async def benchmark(users: int, reply_rate: float, bounce_rate: float, cycles: int):
+    async with FakeMailServer() as server:
+        gmail = Gmail(google_cfg.copy(update={
+            'smtp_host': server.host,
+            'smtp_port': server.smtp_port,
+            'imap_host': server.host,
+            'imap_port': server.imap_port,
+            'mailbox': 'INBOX',
+            'use_tls': False,
+            'send_rate': users
+        }))
+        joined = time.time()
+        entries = [
+            UserEntry(UserDetails(i, joined, 'Test', f'User{i}', f'tu{i}@psu.edu', 0, 0, 'PENDING_BOTH'), is_registered=True)
+            for i in range(users)
+        ]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(gmail.send_email_to(entry.psu_email) for entry in entries))
+        elapsed = time.perf_counter() - start
+        print(f'send:  {len(server.sent)} emails in {elapsed:.2f}s ({len(server.sent) / elapsed:.0f} emails/s)')
+
+        replies, bounces = int(users * reply_rate), int(users * bounce_rate)
+        idle = asyncio.create_task(gmail.wait_for_mail(10))
+        await asyncio.sleep(0.5)
+        start = time.perf_counter()
+        server.inject_reply(entries[0].psu_email, _subject(entries[0].psu_email))
+        await idle
+        print(f'idle:  woke {(time.perf_counter() - start) * 1000:.1f}ms after a reply landed')
+        for entry in entries[1:replies]:
+            server.inject_reply(entry.psu_email, _subject(entry.psu_email))
+        for entry in entries[replies:replies + bounces]:
+            server.inject_bounce(_subject(entry.psu_email))
+
+        for cycle in range(1, cycles + 1):
+            start = time.perf_counter()
+            statuses = await gmail.check_for_replies(entries)
+            elapsed = time.perf_counter() - start
+            handled = Counter(handler.__name__ for handler in statuses.values())
+            print(f'poll {cycle}: {elapsed * 1000:.1f}ms for {len(entries)} pending users - {dict(handled)}')
+        gmail.unload()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--reply-rate', type=float, default=0.8)
+    parser.add_argument('--bounce-rate', type=float, default=0.05)
+    parser.add_argument('--cycles', type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.users, args.reply_rate, args.bounce_rate, args.cycles))
+
+
+if __name__ == '__main__':
+    main()
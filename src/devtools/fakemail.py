@@ -0,0 +1,219 @@
+import asyncio
+import email as eml
+import re
+from dataclasses import dataclass, field
+from email.message import EmailMessage, Message
+from typing import Optional
+
+_postmaster: str = 'postmaster@pennstateoffice365.onmicrosoft.com'
+_search_subject = re.compile(r'SUBJECT "([^"]*)"', re.IGNORECASE)
+_fetch_items = re.compile(r'\((.*)\)$')
+
+
+@dataclass
+class StoredMail:
+    uid: int
+    raw: bytes
+    seen: bool = False
+    message: Message = field(init=False)
+
+    def __post_init__(self):
+        self.message = eml.message_from_bytes(self.raw)
+
+    def header_fields(self, *names: str) -> bytes:
+        return ''.join(f'{name}: {self.message[name]}\r\n' for name in names if self.message[name] is not None).encode() + b'\r\n'
+
+    def header(self) -> bytes:
+        return self.raw.split(b'\r\n\r\n', 1)[0] + b'\r\n\r\n'
+
+
+class FakeMailServer:
+    def __init__(self, host: str = '127.0.0.1'):
+        """
+        Local stand-in for Gmail's SMTP and IMAP servers, for exercising `common.bot.email` without real credentials.
+
+        Mail sent over SMTP is recorded in `sent` and stored in the mailbox as seen, the way Gmail's All Mail keeps sent
+        mail. Replies and postmaster bounces are injected with `inject_reply` and `inject_bounce`. The IMAP side
+        implements only what `Gmail` uses: LOGIN, SELECT, NOOP, UID SEARCH on SUBJECT/UNSEEN, UID FETCH of headers,
+        UID STORE of the \\Seen flag, IDLE and LOGOUT. Any credentials are accepted, and no TLS is offered, so clients
+        must set `use_tls` to False.
+
+        :param host: The interface both servers listen on.
+        """
+        self.host: str = host
+        self.sent: list[Message] = []
+        self.mailbox: list[StoredMail] = []
+        self.__next_uid: int = 1
+        self.__idlers: set[asyncio.StreamWriter] = set()
+        self.__clients: set[asyncio.StreamWriter] = set()
+        self.__smtp_server: Optional[asyncio.AbstractServer] = None
+        self.__imap_server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def smtp_port(self) -> int:
+        return self.__smtp_server.sockets[0].getsockname()[1]
+
+    @property
+    def imap_port(self) -> int:
+        return self.__imap_server.sockets[0].getsockname()[1]
+
+    async def start(self) -> 'FakeMailServer':
+        self.__smtp_server = await asyncio.start_server(self.__serve_smtp, self.host, 0)
+        self.__imap_server = await asyncio.start_server(self.__serve_imap, self.host, 0)
+        return self
+
+    async def close(self):
+        for server in (self.__smtp_server, self.__imap_server):
+            server.close()
+        for client in self.__clients:
+            client.close()
+        while self.__clients:
+            await asyncio.sleep(0)
+        for server in (self.__smtp_server, self.__imap_server):
+            await server.wait_closed()
+
+    async def __aenter__(self) -> 'FakeMailServer':
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __store(self, raw: bytes, seen: bool) -> StoredMail:
+        mail = StoredMail(self.__next_uid, raw, seen)
+        self.__next_uid += 1
+        self.mailbox.append(mail)
+        for idler in self.__idlers:
+            idler.write(f'* {len(self.mailbox)} EXISTS\r\n'.encode())
+        return mail
+
+    def __inject(self, sender: str, subject: str, body: str) -> StoredMail:
+        message = EmailMessage()
+        message['From'] = sender
+        message['Subject'] = subject
+        message.set_content(body)
+        return self.__store(message.as_bytes().replace(b'\n', b'\r\n'), seen=False)
+
+    def inject_reply(self, psu_email: str, subject: str) -> StoredMail:
+        """
+        Delivers a reply from `psu_email` to the verification email with subject `subject`.
+        """
+        return self.__inject(psu_email, f'RE: {subject}', 'Verifying my discord account.')
+
+    def inject_bounce(self, subject: str) -> StoredMail:
+        """
+        Delivers an Office 365 postmaster bounce for the verification email with subject `subject`.
+        """
+        return self.__inject(f'Microsoft Outlook <{_postmaster}>', f'Undeliverable: {subject}', 'Delivery has failed.')
+
+    # ----- SMTP:
+
+    async def __serve_smtp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(b'220 fakemail ESMTP\r\n')
+        self.__clients.add(writer)
+        try:
+            while line := await reader.readline():
+                command = line.decode().strip().upper()
+                if command.startswith('EHLO'):
+                    writer.write(b'250-fakemail\r\n250 AUTH PLAIN LOGIN\r\n')
+                elif command.startswith('AUTH'):
+                    writer.write(b'235 2.7.0 Accepted\r\n')
+                elif command == 'DATA':
+                    writer.write(b'354 Go ahead\r\n')
+                    lines = []
+                    while (data := await reader.readline()) not in (b'.\r\n', b''):
+                        lines.append(data[1:] if data.startswith(b'..') else data)
+                    raw = b''.join(lines)
+                    self.sent.append(eml.message_from_bytes(raw))
+                    self.__store(raw, seen=True)
+                    writer.write(b'250 2.0.0 OK\r\n')
+                elif command == 'QUIT':
+                    writer.write(b'221 2.0.0 Bye\r\n')
+                    break
+                else:
+                    writer.write(b'250 OK\r\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.__clients.discard(writer)
+            writer.close()
+
+    # ----- IMAP:
+
+    def __search(self, criteria: str) -> list[int]:
+        subject = _search_subject.search(criteria)
+        return [
+            mail.uid for mail in self.mailbox
+            if (subject is None or subject.group(1).lower() in (mail.message['Subject'] or '').lower())
+            and not ('UNSEEN' in criteria.upper() and mail.seen)
+        ]
+
+    def __fetch(self, uid_set: str, items: str) -> bytes:
+        uids = {int(uid) for uid in uid_set.split(',')}
+        fields = _fetch_items.search(items.strip())
+        fields = fields.group(1) if fields else items
+        response = b''
+        for seq, mail in enumerate(self.mailbox, start=1):
+            if mail.uid not in uids:
+                continue
+            if 'HEADER.FIELDS' in fields.upper():
+                names = re.search(r'HEADER\.FIELDS \(([^)]*)\)', fields, re.IGNORECASE).group(1).split()
+                data = mail.header_fields(*names)
+            else:
+                data = mail.header()
+            if 'PEEK' not in fields.upper():
+                mail.seen = True
+            item = fields.replace('.PEEK', '')
+            response += f'* {seq} FETCH (UID {mail.uid} {item} {{{len(data)}}}\r\n'.encode() + data + b')\r\n'
+        return response
+
+    def __store_flags(self, uid_set: str, flags: str) -> bytes:
+        uids = {int(uid) for uid in uid_set.split(',')}
+        response = b''
+        for seq, mail in enumerate(self.mailbox, start=1):
+            if mail.uid in uids and '\\SEEN' in flags.upper():
+                mail.seen = flags.startswith('+')
+                flag = '\\Seen' if mail.seen else ''
+                response += f'* {seq} FETCH (UID {mail.uid} FLAGS ({flag}))\r\n'.encode()
+        return response
+
+    async def __serve_imap(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(b'* OK [CAPABILITY IMAP4rev1 IDLE] fakemail ready\r\n')
+        self.__clients.add(writer)
+        try:
+            while line := await reader.readline():
+                tag, command, *args = line.decode().rstrip('\r\n').split(' ', 2)
+                command, args = command.upper(), args[0] if args else ''
+                if command == 'CAPABILITY':
+                    writer.write(b'* CAPABILITY IMAP4rev1 IDLE\r\n')
+                elif command == 'SELECT':
+                    writer.write(f'* {len(self.mailbox)} EXISTS\r\n'.encode())
+                elif command == 'UID':
+                    sub_command, _, sub_args = args.partition(' ')
+                    if sub_command.upper() == 'SEARCH':
+                        writer.write(f'* SEARCH {" ".join(map(str, self.__search(sub_args)))}'.rstrip().encode() + b'\r\n')
+                    elif sub_command.upper() == 'FETCH':
+                        uid_set, _, items = sub_args.partition(' ')
+                        writer.write(self.__fetch(uid_set, items))
+                    elif sub_command.upper() == 'STORE':
+                        uid_set, _, flags = sub_args.partition(' ')
+                        writer.write(self.__store_flags(uid_set, flags))
+                elif command == 'IDLE':
+                    writer.write(b'+ idling\r\n')
+                    await writer.drain()
+                    self.__idlers.add(writer)
+                    try:
+                        await reader.readline()
+                    finally:
+                        self.__idlers.discard(writer)
+                elif command == 'LOGOUT':
+                    writer.write(f'* BYE fakemail logging out\r\n{tag} OK LOGOUT completed\r\n'.encode())
+                    await writer.drain()
+                    break
+                writer.write(f'{tag} OK {command} completed\r\n'.encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.__clients.discard(writer)
+            writer.close()
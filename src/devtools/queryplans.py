@@ -0,0 +1,68 @@
+"""
+Checks that the hot queries of `common.data.userdb` are served by indexes.
+
+A scratch database is migrated to the latest schema, and each query's EXPLAIN QUERY PLAN is checked for full table
+scans and temporary B-trees. The only scan allowed is the first keyset page walking `users_joined_idx` in order, which
+stops after one page. Exits with status 1 if any plan regressed.
+
+Usage (from src/): python -m devtools.queryplans
+"""
+import asyncio
+import sys
+from typing import Optional
+
+import aiosqlite as sqlite
+
+from common.bot.userstatus import UserStatus
+from common.data.migrations import migrate
+from common.data.userdb import (_after_key, _due_emails_query, _entry_query, _keyset_query, _next_due_query,
+                                _status_entries_query, _status_message_query, _status_query)
+
+_statuses: tuple[str, ...] = (UserStatus.PENDING_BOTH.name, UserStatus.PENDING_EMAIL.name)
+_placeholders: str = ', '.join('?' * len(_statuses))
+
+# (name, query, params, the one SCAN line the plan may contain)
+_checks: list[tuple[str, str, tuple, Optional[str]]] = [
+    ('entry', _entry_query.format('?, ?'), (1, 2), None),
+    ('status message', _status_message_query, (1,), None),
+    ('users with status', _status_query.format(_placeholders), _statuses, None),
+    ('fetch users with status', _status_entries_query.format(_placeholders), _statuses, None),
+    ('keyset first page', _keyset_query.format(_placeholders, ''), (*_statuses, 100),
+     'SCAN users USING INDEX users_joined_idx'),
+    ('keyset next page', _keyset_query.format(_placeholders, _after_key), (*_statuses, 0.0, 0, 100), None),
+    ('due emails', _due_emails_query, (0.0, 100), None),
+    ('next email due', _next_due_query, (0.0,), None),
+]
+
+
+def _problems(plan: list[str], allowed_scan: Optional[str]) -> list[str]:
+    return [
+        detail for detail in plan
+        if 'TEMP B-TREE' in detail or (detail.startswith('SCAN') and detail != allowed_scan)
+    ]
+
+
+async def check() -> bool:
+    """
+    :return: True if no query plan contains a table scan or temporary B-tree it is not allowed to.
+    """
+    passed = True
+    async with sqlite.connect(':memory:') as conn:
+        await migrate(conn)
+        for name, query, params, allowed_scan in _checks:
+            async with conn.execute('EXPLAIN QUERY PLAN ' + query, params) as cur:
+                plan = [detail for *_, detail in await cur.fetchall()]
+            problems = _problems(plan, allowed_scan)
+            passed = passed and not problems
+            print(f'{"FAIL" if problems else "ok":<6}{name}')
+            for detail in plan:
+                print(f'{"":<6}{"!" if detail in problems else " "} {detail}')
+    return passed
+
+
+def main():
+    sys.exit(0 if asyncio.run(check()) else 1)
+
+
+if __name__ == '__main__':
+    main()
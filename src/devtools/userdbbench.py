@@ -0,0 +1,118 @@
+"""
+Per-call overhead of the `user_operation` and `global_operation` decorators of `common.data.userdb`.
+
+Every operation of `UserEntryManager` is either a coroutine or an async generator, guarded by one of the two
+decorators. Each shape is timed with a no-op body, undecorated, with the decorators that wrapped every call in an extra
+coroutine or re-yielding async generator, and with the current decorators, so the numbers are the decorator overhead
+alone and do not depend on the database.
+
+Usage (from src/): python -m devtools.userdbbench --calls 200000 --items 100
+"""
+import argparse
+import asyncio
+import time
+from functools import wraps
+from types import AsyncGeneratorType
+
+from common.data.userdb import user_operation, global_operation
+from common.exceptions import InvalidGlobalOperation, UnregisteredUserError
+
+
+def _rewrapping_user_operation(coro):
+    @wraps(coro)
+    def wrapper(*args, **kwargs):
+        self = args[0]
+        if not self.is_registered:
+            raise UnregisteredUserError(self.discord_user)
+        if self.discord_user is None:
+            raise InvalidGlobalOperation(self, coro.__name__)
+
+        coro_inst = coro(*args, **kwargs)
+        if isinstance(coro_inst, AsyncGeneratorType):
+            async def inner():
+                async for val in coro_inst:
+                    yield val
+        else:
+            async def inner():
+                return await coro_inst
+        return inner()
+    return wrapper
+
+
+def _rewrapping_global_operation(coro):
+    @wraps(coro)
+    def wrapper(*args, **kwargs):
+        coro_inst = coro(*args, **kwargs)
+        if isinstance(coro_inst, AsyncGeneratorType):
+            async def inner():
+                async for val in coro_inst:
+                    yield val
+        else:
+            async def inner():
+                return await coro_inst
+        return inner()
+    return wrapper
+
+
+async def _operation(self):
+    pass
+
+
+async def _generator_operation(self, items: int):
+    for i in range(items):
+        yield i
+
+
+class _Context:
+    # Stands in for a registered User context of UserEntryManager.
+    is_registered: bool = True
+    discord_user: object = object()
+
+
+_decorators = {
+    'user_operation': {'undecorated': None, 'rewrapping': _rewrapping_user_operation, 'current': user_operation},
+    'global_operation': {'undecorated': None, 'rewrapping': _rewrapping_global_operation, 'current': global_operation},
+}
+
+
+async def _time_calls(operation, calls: int) -> float:
+    context = _Context()
+    start = time.perf_counter()
+    for _ in range(calls):
+        await operation(context)
+    return (time.perf_counter() - start) / calls
+
+
+async def _time_generator(operation, calls: int, items: int) -> float:
+    context = _Context()
+    start = time.perf_counter()
+    for _ in range(calls):
+        async for _ in operation(context, items):
+            pass
+    return (time.perf_counter() - start) / calls
+
+
+async def benchmark(calls: int, items: int):
+    print(f'{"decorator":<18}{"shape":<22}{"undecorated":>12}{"rewrapping":>12}{"current":>12}')
+    for name, variants in _decorators.items():
+        coroutine, per_call, per_item = {}, {}, {}
+        for variant, decorator in variants.items():
+            decorate = decorator or (lambda operation: operation)
+            coroutine[variant] = await _time_calls(decorate(_operation), calls)
+            generator = decorate(_generator_operation)
+            per_call[variant] = await _time_generator(generator, calls, 0)
+            per_item[variant] = (await _time_generator(generator, calls // items, items) - per_call[variant]) / items
+        for shape, timings in (('coroutine call', coroutine), ('async gen call', per_call), ('async gen item', per_item)):
+            print(f'{name:<18}{shape:<22}' + ''.join(f'{timings[variant] * 1e9:>10.0f}ns' for variant in variants))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--items', type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.calls, args.items))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,35 +1,59 @@
-from discord import Message
+from typing import Optional
+
+from discord import Message, Guild
+from discord.abc import GuildChannel
 from discord.ext import commands
 
 from common.bot import views
+from common.bot.views.rehydration import StatusViewRehydration
+from common.data import embeds as emb
 from common.data.settings import discord_cfg
-from common.data._userdb import UserEntryManager
 
 
 class CommonListeners(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.__bot: commands.Bot = bot
+        self.__rehydration: StatusViewRehydration = StatusViewRehydration(bot)
 
     @commands.Cog.listener(name='on_ready')
     async def reconnect_status_views(self) -> None:
         """
         Valid status views that have been established on previous runtime sessions of the bot are re-established here
-        so that the bot can maintain them during its current runtime.
+        so that the bot can maintain them during its current runtime. See `StatusViewRehydration`. A reconnect while
+        the views are being re-established resumes where the last attempt left off.
+
+        If `status_view_dispatcher` is set, only the dispatcher is registered, and views are loaded when their status
+        message is used.
         """
+        if discord_cfg.status_view_dispatcher:
+            views.start_dispatcher(self.__bot)
+            views._are_status_views_loaded = True
         if not views.are_status_views_loaded():
-            async with UserEntryManager() as users:
-                async for user_entry in users.get_unverified_users():
-                    views.make_status_view(self.__bot, user_entry)
+            await self.__rehydration.run()
             views._are_status_views_loaded = True
 
-    @commands.Cog.listener(name='on_message')
-    async def allow_only_commands(self, message: Message) -> None:
+    @commands.Cog.listener(name='on_guild_update')
+    async def refresh_guild_embeds(self, _: Guild, guild: Guild) -> None:
+        """
+        Rebuilds the embeds that mention the operating discord when it changes.
+        """
+        if guild.id == discord_cfg.operating_discord:
+            emb.clear_guild_templates()
+
+    @commands.Cog.listener(name='on_guild_channel_update')
+    async def refresh_channel_embeds(self, _: GuildChannel, channel: GuildChannel) -> None:
+        """
+        Rebuilds the embeds that mention the request channel when it changes.
+        """
+        if channel.id == discord_cfg.request_channel:
+            emb.clear_guild_templates()
+
+    async def allow_only_commands(self, message: Message, ctx: Optional[commands.Context]) -> None:
         """
         Any message sent to the commands channel defined in the discord config that is not a command is deleted by this
-        function.
-        :param message: The message sent, passed in from the event on_message.
+        function. Handles `Route.REQUEST_CHANNEL` of the `MessageRouter`.
+        :param message: The message sent to the request channel.
+        :param ctx: The message's context, or None if the message is not a command.
         """
-        if self.__bot.user.id != message.author.id:
-            ctx: commands.Context = await self.__bot.get_context(message)
-            if not ctx.valid and message.channel.id == discord_cfg.request_channel:
-                await message.delete()
+        if ctx is None or not ctx.valid:
+            await message.delete()
@@ -2,10 +2,16 @@ from discord.ext import commands
 
 from extensions.admin import AdminCommands
 from extensions.common import CommonListeners
+from extensions.router import MessageRouter, Route
 from extensions.verify import DiscordVerification
 
 
 def setup(bot: commands.Bot):
-    bot.add_cog(CommonListeners(bot))
-    bot.add_cog(DiscordVerification(bot))
+    common, verification = CommonListeners(bot), DiscordVerification(bot)
+    router = MessageRouter(bot)
+    router.add_handler(Route.REQUEST_CHANNEL, common.allow_only_commands)
+    router.add_handler(Route.DM, verification.listen_for_dms)
+    bot.add_cog(router)
+    bot.add_cog(common)
+    bot.add_cog(verification)
     bot.add_cog(AdminCommands(bot))
@@ -0,0 +1,87 @@
+import logging
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from enum import Enum, auto
+from typing import Optional
+
+from discord import Message
+from discord.ext import commands
+
+from common.data.settings import discord_cfg
+
+log = logging.getLogger(__name__)
+
+MessageHandler = Callable[[Message, Optional[commands.Context]], Awaitable[None]]
+
+
+class Route(Enum):
+    DM = auto()
+    REQUEST_CHANNEL = auto()
+
+
+class MessageRouter(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        """
+        The only on_message listener of the bot. Each message is classified once, as a direct message, a message in
+        the request channel, or neither, and handed to the handlers added for its route.
+
+        Messages are parsed for commands once, and only if they start with the command prefix. The parsed context is
+        used to invoke the command and is shared with the route's handlers, which receive None for messages that are
+        not commands. Messages in any other channel that are not commands are dropped without being parsed. The bot's
+        own messages are dropped before anything else.
+
+        The bot must not process commands itself, see `main.on_message`.
+
+        `dropped` counts the messages dropped at each stage, and `parsed` and `unparsed` count the messages that
+        were and were not parsed for commands.
+        """
+        self.__bot: commands.Bot = bot
+        self.__handlers: dict[Route, list[MessageHandler]] = {route: [] for route in Route}
+        self.dropped: Counter[str] = Counter()
+        self.parsed: int = 0
+        self.unparsed: int = 0
+
+    def add_handler(self, route: Route, handler: MessageHandler) -> None:
+        self.__handlers[route].append(handler)
+
+    def __classify(self, message: Message) -> Optional[Route]:
+        if message.guild is None:
+            return Route.DM
+        if message.channel.id == discord_cfg.request_channel:
+            return Route.REQUEST_CHANNEL
+        return None
+
+    async def __parse(self, message: Message) -> Optional[commands.Context]:
+        """
+        :return: The context of `message`, or None if it cannot be a command.
+        """
+        if message.author.bot or not message.content.startswith(discord_cfg.command_prefix):
+            self.unparsed += 1
+            return None
+        self.parsed += 1
+        return await self.__bot.get_context(message)
+
+    @commands.Cog.listener(name='on_message')
+    async def route(self, message: Message) -> None:
+        if message.author.id == self.__bot.user.id:
+            self.dropped['own message'] += 1
+            return
+        route = self.__classify(message)
+        ctx = await self.__parse(message)
+        if ctx is not None and ctx.valid:
+            await self.__bot.invoke(ctx)
+        elif route is None:
+            self.dropped['unrouted'] += 1
+        if route is None:
+            return
+        if not self.__handlers[route]:
+            self.dropped['unhandled'] += 1
+            return
+        for handler in self.__handlers[route]:
+            try:
+                await handler(message, ctx)
+            except Exception:
+                log.exception('Message handler %s failed on message %d', handler.__qualname__, message.id)
+
+    def __repr__(self) -> str:
+        return f'MessageRouter(parsed={self.parsed}, unparsed={self.unparsed}, dropped={dict(self.dropped)})'
@@ -1,4 +1,5 @@
 from re import match
+from typing import Optional
 
 from discord import Message, DMChannel
 from discord.ext import commands, tasks
@@ -21,7 +22,10 @@ class DiscordVerification(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.__bot: commands.Bot = bot
         # self.__gmail: Gmail = Gmail()
-        # self.check_for_email_replies.start()
+        # self.__reply_watcher: ReplyWatcher = ReplyWatcher(self.__gmail, self.check_for_email_replies)
+        # self.__reply_watcher.start()
+        # self.__outbox: OutboxSender = OutboxSender(self.__gmail)
+        # self.__outbox.start()
 
     """
     ----------------------------------------------------------------------------------------------------------------
@@ -29,16 +33,15 @@ class DiscordVerification(commands.Cog):
     ----------------------------------------------------------------------------------------------------------------
     """
 
-    @commands.Cog.listener(name='on_message')
-    async def listen_for_dms(self, message: Message) -> None:
+    async def listen_for_dms(self, message: Message, _: Optional[commands.Context]) -> None:
         """
         Listens for user direct messages during the PENDING_BOTH or PENDING_DM status portion of the verification
         process. When a user sends an image or an embed of their canvas home page, the image(s)/embed(s) are sent
-        to the user verification status message for admins to manually review.
-        :param message: The message sent, passed in from the event on_message.
+        to the user verification status message for admins to manually review. Handles `Route.DM` of the
+        `MessageRouter`, so messages sent by the bot itself never reach it.
+        :param message: The direct message sent.
         """
-        if message.guild is None and self.__bot.user.id != message.author.id:
-            ...
+        ...
         # if self.__bot.user.id != message.author.id and message.guild is None:
         #     verification_manager = await VerificationManager.from_discord_user(message.author)
         #     if not verification_manager.is_user_registered:
@@ -57,13 +60,13 @@ class DiscordVerification(commands.Cog):
     @tasks.loop(seconds=dcfg.email_refresh_rate)
     async def check_for_email_replies(self):
         ...
-        # async with UserEntryManager() as users:
-        #     async for user_entry in users.get_unverified_users():
-        #         _user = await user_entry.user
-        #         if await userdb.is_user_registered_with_status(_user, userstatus.is_user_pending_email):
-        #             async with UserEntryManager(_user) as user_manager:
-        #                 email_status = self.__gmail.check_for_replies(user_entry)
-        #                 await email_status(user_entry, user_manager, views.loaded_status_views[user_entry.user_id])
+        # pending = [UserEntry(user_details, bot=self.__bot, is_registered=True)
+        #            async for user_details in userdb.iter_users_with_status(UserStatus.PENDING_BOTH, UserStatus.PENDING_EMAIL)]
+        # replies = await self.__gmail.check_for_replies(pending)
+        # for user_entry in pending:
+        #     async with UserEntryManager(await user_entry.user) as user_manager, \
+        #             views.using_status_view(self.__bot, user_entry) as view:
+        #         await replies[user_entry.user_id](user_entry, user_manager, view)
 
     """
     ----------------------------------------------------------------------------------------------------------------
@@ -105,7 +108,7 @@ class DiscordVerification(commands.Cog):
         #         await dm_channel.send(emb.initial_dm_content(), embed=emb.INITIAL_DM)
         #         await status_message.edit(embed=await emb.create_status_message(user_entry), view=views.make_status_view(self.__bot, user_entry))
         #         await user.register_user(user_entry)
-        #         self.__gmail.send_email_to(email)
+        #         await user.queue_verification_email()
         #     else:
         #         # Todo: 'update' user information embed - tell user to use update
         #         pass
@@ -178,5 +181,6 @@ class DiscordVerification(commands.Cog):
 
     def cog_unload(self) -> None:
         ...
-        # self.check_for_email_replies.cancel()
+        # self.__reply_watcher.stop()
+        # self.__outbox.stop()
         # self.__gmail.unload()
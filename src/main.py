@@ -1,5 +1,6 @@
 import logging
 
+from common.data.database import pool
 from common.data.settings import discord_cfg
 
 from discord.ext import commands
@@ -18,12 +19,41 @@ bot = commands.Bot(
 discord_cfg.finalize(bot)
 
 
+@bot.event
+async def on_message(_: discord.Message):
+    """
+    Replaces the bot's own command processing. Commands are parsed and invoked by `extensions.router.MessageRouter`,
+    which parses each message once and shares the context with its other handlers.
+    """
+
+
 # ----- Main:
 
+async def shutdown():
+    """
+    Closes the bot, then commits and closes the database. Safe to await more than once.
+    """
+    if not bot.is_closed():
+        await bot.close()
+    await pool.close()
+
+
+async def run():
+    await pool.open()
+    try:
+        await bot.start(discord_cfg.auth_token)
+    finally:
+        await shutdown()
+
+
 def start():
     logging.basicConfig(level=logging.INFO)
     bot.load_extension('extensions.loader')
-    bot.run(discord_cfg.auth_token)
+    try:
+        bot.loop.run_until_complete(run())
+    except KeyboardInterrupt:
+        # The interrupt stops the loop before run() can clean up, so pending writes are committed here instead.
+        bot.loop.run_until_complete(shutdown())
 
 
 if __name__ == '__main__':